@@ -1,9 +1,19 @@
 from ._anno import Anno, NO_DEFAULT
-from ._array import Array, to_array, array_type
-from ._calltypes import WithCallTypes, add_call_types, make_annotations
+from ._array import Array, to_array, array_type, make_array, array_cls, \
+    array_from_buffer, ndarray_from_buffer, ARRAY_BUFFER_TYPEID, \
+    set_array_validation, validate_elements, set_array_packing
+from ._calltypes import WithCallTypes, add_call_types, make_annotations, \
+    evaluate_call_types, add_slots
+from ._cache import set_type_comment_cache, save_type_comment_caches
+from ._coerce import coerce_call_types
 from ._frozen_dict import FrozenOrderedDict
 from ._serializable import Serializable, serialize_object, deserialize_object, \
-    json_encode, json_decode, stringify_error
+    json_encode, json_decode, stringify_error, register_serializer, \
+    json_encode_iter, json_dump, json_deserialize
+from ._binary import binary_encode, binary_decode
+from ._table import Table
+from ._delta import TrackedSerializable, apply_changes
+from ._memo import MemoizedSerializable
 from ._typing import (
     TYPE_CHECKING, TypeVar, Sequence, Union, Optional, Generic,
     overload, Mapping, Any, GenericMeta
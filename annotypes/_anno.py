@@ -1,11 +1,14 @@
 import copy
+import itertools
 import sys
 
 from ._typing import TYPE_CHECKING, Union, MappingOrigin
-from ._array import Array, to_array
+from ._array import Array, to_array, array_cls
+from ._compat import primitive_types, primitive_key
 
 if TYPE_CHECKING:  # pragma: no cover
-    from typing import Dict, Set, Optional, Any, Sequence, Union, Type
+    from typing import Dict, Set, Optional, Any, Sequence, Union, Type, \
+        List
 
 # Signifies that this is a return value and the default value should be inferred
 RETURN_DEFAULT = object()
@@ -33,23 +36,59 @@ def anno_with_default(src, default=RETURN_DEFAULT):
                 "default=%r" % (anno, default)
     else:
         anno = src
-    # Make a copy of the anno with the new default if needed
-    if default not in (RETURN_DEFAULT, NO_DEFAULT):
-        anno = copy.copy(anno)
-        anno.default = default
+    # Make a copy of the anno with the new default if needed. If it isn't an
+    # Anno then leave it for the caller to complain about
+    if default not in (RETURN_DEFAULT, NO_DEFAULT) and isinstance(anno, Anno):
+        key = _default_key(default)
+        if key is None:
+            anno = _copy_with_default(anno, default, None)
+        else:
+            # Share one read only copy per default between all the arguments
+            # that use it
+            defaulted = anno._defaulted
+            if defaulted is None:
+                # Set directly, as anno may itself be a read only copy
+                defaulted = anno.__dict__["_defaulted"] = {}
+            try:
+                return defaulted[key]
+            except KeyError:
+                anno = defaulted.setdefault(key, _copy_with_default(
+                    anno, default, defaulted))
+    return anno
+
+
+def _default_key(default):
+    # type: (Any) -> Any
+    # Return a key that only equals the key of the same default, or None if
+    # it can't be shared
+    cls = default.__class__
+    if cls in primitive_types:
+        return primitive_key(default)
+    elif cls is tuple and all(x.__class__ in primitive_types for x in default):
+        return cls, tuple(primitive_key(x) for x in default)
+    else:
+        return None
+
+
+def _copy_with_default(anno, default, defaulted):
+    # type: (Anno, Any, Optional[Dict[Any, Anno]]) -> Anno
+    # If defaulted is given the copy will be shared, so make it read only,
+    # and give it the same copies for other defaults as anno has
+    anno = copy.copy(anno)
+    # Set directly, as anno may be a read only copy
+    anno.__dict__.update(default=default, _defaulted=defaulted,
+                         _shared=defaulted is not None)
     return anno
 
 
+# Dicts keep insertion order, so names defined in a with block are at the end
+ORDERED_DICTS = sys.version_info >= (3, 6)
+
+
 def caller_locals():
     # type: () -> Dict
-    """Return the frame object for the caller's stack frame."""
-    try:
-        raise ValueError
-    except ValueError:
-        _, _, tb = sys.exc_info()
-        assert tb, "Can't get traceback, this shouldn't happen"
-        caller_frame = tb.tb_frame.f_back.f_back
-        return caller_frame.f_locals
+    """Return the locals of the caller of the function calling this"""
+    return sys._getframe(2).f_locals
 
 
 def make_repr(inst, attrs):
@@ -82,18 +121,30 @@ class Anno(object):
         self.is_array = False  # type: Optional[bool]
         self.is_mapping = False  # type: Optional[bool]
         self._names_on_enter = None  # type: Optional[Set[str]]
+        self._len_on_enter = 0  # type: int
         self._array_cls = None  # type: Optional[Type[Array]]
+        # (default class, default) -> copy made by anno_with_default()
+        self._defaulted = None  # type: Optional[Dict[Any, Anno]]
+        # Whether it is a copy shared by anno_with_default(), so read only
+        self._shared = False  # type: bool
         # TODO: add min, max, maybe widget
 
     def __call__(self, *args, **kwargs):
         """Pass calls through to our underlying type"""
         if self.is_array:
-            return to_array(Array[self.typ], *args, **kwargs)
+            return to_array(self._array_cls, *args, **kwargs)
         elif self.is_mapping:
             raise TypeError("Type Mapping cannot be instantiated")
         else:
             return self.typ(*args, **kwargs)
 
+    def __setattr__(self, name, value):
+        if self.__dict__.get("_shared", False):
+            raise AttributeError(
+                "Can't set %s of %r as it is shared by all the arguments with "
+                "its default" % (name, self))
+        super(Anno, self).__setattr__(name, value)
+
     def __repr__(self):
         attrs = ["name", "typ", "description"]
         return make_repr(self, attrs)
@@ -111,13 +162,27 @@ class Anno(object):
         >>> if not TYPE_CHECKING:
         ...     MyArg = Anno("The arg to take", name="MyArg").set_typ(str)
         """
-        self._names_on_enter = set(caller_locals())
+        locals_d = caller_locals()
+        if ORDERED_DICTS and locals_d.__class__ is dict:
+            # Just remember where the new names will start
+            self._len_on_enter = len(locals_d)
+        else:
+            self._names_on_enter = set(locals_d)
 
     def _get_defined_name(self, locals_d):
-        defined = set(locals_d) - self._names_on_enter
+        if self._names_on_enter is None:
+            n = self._len_on_enter
+            if len(locals_d) == n + 1 and sys.version_info >= (3, 8):
+                # Just get the last one
+                defined = [next(reversed(locals_d))]  # type: List[str]
+            else:
+                defined = list(itertools.islice(locals_d, n, None))
+        else:
+            defined = list(set(locals_d) - self._names_on_enter)
+            self._names_on_enter = None
         assert len(defined) == 1, \
-            "Expected a single type to be defined, got %s" % list(defined)
-        self.name = defined.pop()
+            "Expected a single type to be defined, got %s" % defined
+        self.name = defined[0]
 
     def set_typ(self, typ, is_array=False, is_mapping=False):
         self.typ = typ
@@ -125,7 +190,7 @@ class Anno(object):
             "Can't have both and array and mapping"
         self.is_array = is_array
         if is_array:
-            self._array_cls = Array[typ]
+            self._array_cls = array_cls(typ)
         self.is_mapping = is_mapping
         return self
 
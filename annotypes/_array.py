@@ -1,4 +1,8 @@
 import array
+import inspect
+import numbers
+import os
+import sys
 
 from ._compat import str_
 from ._typing import TYPE_CHECKING, overload, Sequence, TypeVar, Generic, \
@@ -6,20 +10,108 @@ from ._typing import TYPE_CHECKING, overload, Sequence, TypeVar, Generic, \
 from ._stackinfo import find_caller_class
 
 if TYPE_CHECKING:  # pragma: no cover
-    from typing import Union, Type
+    from typing import Union, Type, Any, Dict
 
 T = TypeVar("T")
 
+# dict mapping element type -> Array subclass with that typ
+_array_classes = {}  # type: Dict[Any, Type[Array]]
+
+# The typeid of the dicts made by serialize_object(binary=True) that hold the
+# buffer of a numpy array
+ARRAY_BUFFER_TYPEID = "annotypes:ArrayBuffer:1.0"
+
+# Set ANNOTYPES_VALIDATE_ARRAYS=1 in the environment to check the elements of
+# every Array that isn't a numpy array, which always has its dtype checked
+_validate = bool(os.environ.get("ANNOTYPES_VALIDATE_ARRAYS"))
+
+# Set ANNOTYPES_PACK_ARRAYS=1 in the environment to store lists of floats and
+# ints given to to_array() in an array.array
+_pack = bool(os.environ.get("ANNOTYPES_PACK_ARRAYS"))
+
+# Whether lists can be wrapped as they are, so code that makes Arrays without
+# to_array() can skip it
+_wrap_lists = not (_validate or _pack)
+
+# dict element type -> typecode of the array.array that stores a list of it
+_typecodes = {float: "d"}  # type: Dict[Any, str]
+if sys.version_info < (3,):
+    # python 2 array.array has no long long, but long is 64-bit on linux
+    _typecodes[int] = "l"
+else:
+    _typecodes[int] = "q"
+
+# dict (element type, class) -> whether instances of class can be elements
+_element_checks = {}  # type: Dict[Any, bool]
+
+# A class whose instances are stored in array.arrays of each typecode
+_typecode_classes = dict(u=type(u""), f=float, d=float)
+_typecode_classes.update((c, int) for c in "bBhHiIlLqQ")
+
 
 def array_type(cls):
     # type: (Type[Array[T]]) -> Type[T]
+    # Look in __dict__ as getattr on a typing alias is slow
+    typ = cls.__dict__.get("typ", None)
+    if typ is not None:
+        # It's a specialised subclass from array_cls()
+        return typ
     type_args = getattr(cls, "__args__", ())
     assert type_args, "Expected Array[<typ>](...), got Array[%s](...)" % (
         ", ".join(repr(x) for x in type_args))
     return type_args[0]
 
 
+# The classes seq_neq() compares the elements of as lists if they differ
+_list_like = (list, tuple, array.array)
+
+
+def is_buffer(seq):
+    # type: (Any) -> bool
+    """Return whether seq is a numpy array or an array.array of numbers"""
+    return hasattr(seq, "dtype") or (
+        seq.__class__ is array.array and seq.typecode != "u")
+
+
+def _as_ndarray(np, seq):
+    # type: (Any, Any) -> Any
+    if is_buffer(seq) and seq.__class__ is array.array and len(seq):
+        # Python 2 numpy can only share its memory with frombuffer
+        return np.frombuffer(seq, seq.typecode)
+    else:
+        return np.asarray(seq)
+
+
 def seq_neq(seq, other):
+    # type: (Any, Any) -> bool
+    """Return whether the elements of sequence seq are different to other
+
+    Lengths are compared first. Numpy arrays and array.arrays are then
+    compared as buffers with numpy if it has been imported, and a list, tuple
+    or array.array is compared to one of the others as a list. Anything else
+    uses !=.
+    """
+    if seq is other:
+        return False
+    try:
+        if len(seq) != len(other):
+            return True
+    except TypeError:
+        # other isn't sized, so leave it to !=
+        pass
+    else:
+        if "numpy" in sys.modules and (
+                hasattr(seq, "dtype") or hasattr(other, "dtype") or (
+                    is_buffer(seq) and is_buffer(other))):
+            # Wrap any array.array without copying, and compare with shape
+            # and elements in one go
+            import numpy as np
+            return not np.array_equal(_as_ndarray(np, seq),
+                                      _as_ndarray(np, other))
+        elif seq.__class__ is not other.__class__ and \
+                seq.__class__ in _list_like and other.__class__ in _list_like:
+            # These are only equal to their own class, so compare as lists
+            seq, other = list(seq), list(other)
     # Do the native compare
     not_equal = seq != other
     if hasattr(not_equal, "any"):
@@ -29,28 +121,47 @@ def seq_neq(seq, other):
     return not_equal
 
 
+def _as_tuples(seq):
+    # type: (Any) -> tuple
+    # Return seq as a tuple, with any lists in it made into tuples too
+    return tuple(_as_tuples(x) if x.__class__ is list else x for x in seq)
+
+
 class Array(Sequence[T], Generic[T]):
     """Wrapper that takes a sequence and provides immutable access to it"""
 
+    # Set as a class attribute on the subclasses made by array_cls(), and as
+    # an instance attribute when instantiated as Array[<typ>](...)
+    typ = None  # type: Any
+
+    # Set on instances whose list was packed into an array.array by
+    # to_array(), so they can still behave like a list
+    _packed = False
+
     def __len__(self):
         # type () -> int
         return len(self.seq)
 
     def __init__(self, seq=None):
+        if self.typ is None:
+            if NEW_TYPING:
+                orig_class = find_caller_class(__file__)
+            else:
+                orig_class = getattr(self, "__orig_class__", None)
+            assert orig_class, "You should instantiate Array[<typ>](...)"
+            self.typ = array_type(orig_class)
+        self._set_seq(seq)
+
+    def _set_seq(self, seq):
         if seq is None:
             seq = []
         self.seq = seq  # type: Sequence[T]
-        if NEW_TYPING:
-            orig_class = find_caller_class(__file__)
-        else:
-            orig_class = getattr(self, "__orig_class__", None)
-        assert orig_class, "You should instantiate Array[<typ>](...)"
-        self.typ = array_type(orig_class)
-        # TODO: add type checking for array.array
         if hasattr(seq, "dtype"):
             assert self.typ == seq.dtype, \
                 "Expected numpy array with dtype %s, got %r with dtype %s" % (
                     self.typ, seq, seq.dtype)
+        elif _validate:
+            validate_elements(self.typ, seq)
 
     @overload
     def __getitem__(self, idx):  # pragma: no cover
@@ -63,6 +174,8 @@ class Array(Sequence[T], Generic[T]):
         pass
 
     def __getitem__(self, item):
+        if item.__class__ is slice and self._packed:
+            return self.seq[item].tolist()
         return self.seq[item]
 
     def __eq__(self, other):
@@ -78,28 +191,277 @@ class Array(Sequence[T], Generic[T]):
         not_equal = seq_neq(self.seq, other)
         return not_equal
 
+    def __hash__(self):
+        # Only an immutable seq can be hashed, and as it can't change the
+        # hash only needs making once. Equal Arrays must have equal hashes
+        # whatever they wrap, so hash the elements as a tuple
+        try:
+            return self._hash
+        except AttributeError:
+            seq = self.seq  # type: Any
+            if seq.__class__ is tuple:
+                self._hash = hash(seq)
+            elif hasattr(seq, "dtype") and not seq.flags.writeable:
+                # Nested like an equal tuple of tuples would be
+                self._hash = hash(_as_tuples(seq.tolist()))
+            else:
+                raise TypeError(
+                    "Array of %s is unhashable, use frozen() to make a "
+                    "hashable copy" % seq.__class__.__name__)
+            return self._hash
+
+    def frozen(self):
+        # type: () -> Array[T]
+        """Return an Array of the same elements that can be hashed, so used
+        as a dict key. It wraps a tuple, with any lists in it made tuples, or
+        a read only numpy array if this wraps a numpy array, and is self if
+        it already does."""
+        seq = self.seq  # type: Any
+        if hasattr(seq, "dtype"):
+            if not seq.flags.writeable:
+                return self
+            seq = seq.copy()
+            seq.flags.writeable = False
+        elif seq.__class__ is tuple:
+            return self
+        else:
+            seq = _as_tuples(seq)
+        return make_array(self.typ, seq)
+
     def __repr__(self):
+        if self._packed:
+            return "Array(%r)" % (self.seq.tolist(),)
         return "Array(%r)" % (self.seq,)
 
+    def __reduce__(self):
+        # The classes made by array_cls() can't be found by name, so pickle
+        # via make_array instead
+        if self._packed:
+            return packed_array, (self.typ, self.seq)
+        return make_array, (self.typ, self.seq)
+
+
+def set_array_validation(enabled):
+    # type: (bool) -> None
+    """Turn on or off checking the elements of each Array when it is made
+
+    Numpy arrays always have their dtype checked. When on, array.arrays have
+    their typecode checked, and other sequences have the class of each
+    element checked. It is off unless the ANNOTYPES_VALIDATE_ARRAYS
+    environment variable is set.
+
+    Args:
+        enabled: Whether to check the elements of Arrays
+    """
+    global _validate, _wrap_lists
+    _validate = enabled
+    _wrap_lists = not (_validate or _pack)
+
+
+def set_array_packing(enabled):
+    # type: (bool) -> None
+    """Turn on or off storing lists given to to_array() in an array.array
+
+    When on, a list of floats for an Array[float], or of ints for an
+    Array[int], is copied into an array.array, which stores each element in
+    8 bytes rather than as a pointer to a Python object. The elements, their
+    serialization and equality are the same. Lists with any other types of
+    element, like ints in an Array[float], are left as they are. It is off
+    unless the ANNOTYPES_PACK_ARRAYS environment variable is set.
+
+    Args:
+        enabled: Whether to pack lists
+    """
+    global _pack, _wrap_lists
+    _pack = enabled
+    _wrap_lists = not (_validate or _pack)
+
+
+def pack_list(typ, seq):
+    # type: (Any, Any) -> Any
+    """Return seq copied into an array.array if every element is exactly
+    typ and typ is float or int, otherwise return seq"""
+    typecode = _typecodes.get(typ, None)
+    if typecode and {x.__class__ for x in seq} == {typ}:
+        try:
+            return array.array(typecode, seq)
+        except OverflowError:
+            # Ints too big for 64 bits
+            pass
+    return seq
+
+
+def validate_elements(typ, seq):
+    # type: (Any, Any) -> None
+    """Raise a TypeError if the elements of seq can't be in an Array[typ]
+
+    Each element class is only checked against typ once, so a list is
+    checked by finding the set of its element classes, with no function
+    called per element.
+
+    Args:
+        typ: The element type of the Array
+        seq: The array.array, list or other sequence of elements
+    """
+    if isinstance(seq, array.array):
+        if hasattr(typ, "dtype"):
+            # A numpy scalar type, so needs the same dtype
+            import numpy as np
+            if np.dtype(seq.typecode) != np.dtype(typ):
+                raise TypeError("Expected array.array of %s, got typecode %r"
+                                % (typ.__name__, seq.typecode))
+        elif not element_matches(typ, _typecode_classes[seq.typecode]):
+            raise TypeError("Expected array.array of %s, got typecode %r" % (
+                getattr(typ, "__name__", typ), seq.typecode))
+    else:
+        bad = [cls for cls in {x.__class__ for x in seq}
+               if not element_matches(typ, cls)]
+        if bad:
+            raise TypeError("Expected elements of type %s, got %s" % (
+                getattr(typ, "__name__", typ),
+                ", ".join(sorted(cls.__name__ for cls in bad))))
+
+
+def element_matches(typ, cls):
+    # type: (Any, type) -> bool
+    """Return whether instances of cls can be elements of an Array[typ]"""
+    try:
+        return _element_checks[typ, cls]
+    except KeyError:
+        matches = _element_matches(typ, cls)
+        return _element_checks.setdefault((typ, cls), matches)
+
+
+def _element_matches(typ, cls):
+    # type: (Any, type) -> bool
+    if not inspect.isclass(typ) or typ is object:
+        # Like Any or a TypeVar, so anything goes
+        return True
+    elif typ is bool:
+        # Allow numpy bools, which aren't a subclass of bool
+        return issubclass(cls, bool) or (
+            cls.__module__ == "numpy" and cls.__name__.startswith("bool"))
+    elif typ is str:
+        # Allow unicode on Python 2
+        typ = str_
+    for abc in (numbers.Integral, numbers.Real, numbers.Complex):
+        # Allow any number that can be converted without losing information,
+        # like Python ints in an Array[np.int32] or an Array[float]
+        if issubclass(typ, abc):
+            return issubclass(cls, abc)
+    try:
+        return issubclass(cls, typ)
+    except TypeError:
+        # Typing generics like Mapping[str, Any] can't be checked
+        return True
+
+
+def array_cls(typ):
+    # type: (Type[T]) -> Type[Array[T]]
+    """Get the Array subclass for element type typ, creating it if needed
+
+    The subclass has typ as a class attribute, so instantiating it doesn't
+    need to walk the stack or create a typing alias to find it out
+    """
+    try:
+        return _array_classes[typ]
+    except KeyError:
+        meta = type(Array)  # type: Any
+        cls = meta("Array", (Array,), dict(typ=typ, __module__=__name__))
+        # If another thread got there first then use its class
+        return _array_classes.setdefault(typ, cls)
+
+
+def make_array(typ, seq=None):
+    # type: (Type[T], Any) -> Array[T]
+    """Make an Array with element type typ wrapping seq
+
+    This is equivalent to Array[typ](seq), but as the element type is passed
+    explicitly there is no need to walk the stack to find it, so it is much
+    faster on Python 3.7+
+    """
+    # Generic.__new__ only guards against instantiating Generic itself, so
+    # skip it as it is a significant fraction of the construction time
+    inst = object.__new__(array_cls(typ))
+    inst._set_seq(seq)
+    return inst
+
+
+def packed_array(typ, seq):
+    # type: (Type[T], Any) -> Array[T]
+    """Make an Array with element type typ wrapping an array.array made by
+    pack_list(), which gives lists when sliced like the list it was made
+    from would"""
+    inst = make_array(typ, seq)
+    inst._packed = True
+    return inst
+
 
 def to_array(typ, seq=None):
     # type: (Type[Array[T]], Union[Array[T], Sequence[T], T]) -> Array[T]
     expected = array_type(typ)
-    if hasattr(seq, "dtype") or isinstance(seq, array.array):
+    if seq.__class__ is list and seq:
+        # Fast path for the most common case of a non-empty list
+        if _pack:
+            packed = pack_list(expected, seq)
+            if packed is not seq:
+                return packed_array(expected, packed)
+        return make_array(expected, seq)
+    elif hasattr(seq, "dtype") or isinstance(seq, array.array):
         # It's a numpy array or stdlib array
-        return typ(seq)
+        return make_array(expected, seq)
     elif isinstance(seq, Array):
         assert expected == seq.typ, \
             "Expected Array[%s], got Array[%s]" % (expected, seq.typ)
         return seq
+    elif isinstance(seq, dict) and seq.get("typeid") == ARRAY_BUFFER_TYPEID:
+        # It's a numpy array serialized with binary=True
+        return make_array(expected, ndarray_from_buffer(seq))
     elif seq is None:
-        return typ()
+        return make_array(expected)
     elif isinstance(seq, str_) or not isinstance(seq, Sequence):
         # Wrap it in a list as it should be a sequence
-        return typ([seq])
+        return make_array(expected, [seq])
     elif len(seq) == 0:
         # Zero length array
-        return typ()
+        return make_array(expected)
     else:
         # It's a sequence, so assume it's ok
-        return typ(seq)
+        return make_array(expected, seq)
+
+
+def ndarray_from_buffer(d):
+    # type: (Dict[str, Any]) -> Any
+    """Make a numpy array that shares the memory of a serialized buffer
+
+    Args:
+        d: A dict made by serialize_object(binary=True) from a numpy array,
+            with its data as a memoryview, bytes or any other buffer
+    """
+    import numpy as np
+    data = d["data"]
+    if isinstance(data, memoryview):
+        # numpy on Python 2 can't make an array from a memoryview directly
+        data = np.asarray(data)
+    return np.frombuffer(data, dtype=d["dtype"]).reshape(d["shape"])
+
+
+def array_from_buffer(d):
+    # type: (Dict[str, Any]) -> Array
+    """Make an Array that wraps a numpy array sharing the memory of a
+    serialized buffer
+
+    The Array typ will be bool, int, float or complex if the dtype is the
+    one numpy uses for that type, otherwise it will be the numpy scalar type
+
+    Args:
+        d: A dict made by serialize_object(binary=True) from a numpy array,
+            with its data as a memoryview, bytes or any other buffer
+    """
+    seq = ndarray_from_buffer(d)
+    for typ in (bool, int, float, complex):
+        if seq.dtype == typ:
+            break
+    else:
+        typ = seq.dtype.type
+    return make_array(typ, seq)
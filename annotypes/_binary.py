@@ -0,0 +1,405 @@
+import array
+import struct
+import sys
+
+from ._frozen_dict import FrozenOrderedDict
+from ._serializable import Serializable, _serializer_cache, \
+    _find_serializer, _serialize_to_dict, _serialize_dict, _serialize_list, \
+    _serialize_array, _serialize_tolist
+
+if sys.version_info < (3,):
+    # python 2
+    int_types = (int, long)
+    unicode_ = unicode
+    # str is text on Python 2, so decode it as text on Python 3 too
+    bytes_tag = b"s"
+else:
+    # python 3
+    int_types = (int,)
+    unicode_ = str
+    bytes_tag = b"b"
+
+# Start of every message, with a version number to change if the format does
+MAGIC = b"AT\x01"
+
+_int64 = struct.Struct("<q")
+_uint64 = struct.Struct("<Q")
+_uint32 = struct.Struct("<I")
+_float64 = struct.Struct("<d")
+
+# The types that are written as they are, rather than being serialized first
+_base_types = (bool, int_types, float, unicode_, bytes, tuple, list, dict)
+
+
+def binary_encode(o):
+    """Encode o in a compact binary format that binary_decode() understands
+
+    Registered Serializables are written as an index into a table of the
+    typeids in the message, followed by their fields in call_types order
+    with no keys, unless they override to_dict() when they are written as
+    the map it makes. Numpy arrays and array.array instances are written as raw
+    bytes. Everything else is written as serialize_object() would make it.
+
+    Args:
+        o: The object to encode
+
+    Returns:
+        bytes: The encoded message
+    """
+    out = bytearray(MAGIC)
+    _encode(o, out, {})
+    return bytes(out)
+
+
+def _encode(o, out, typeids):
+    cls = o.__class__
+    if o is None:
+        out += b"N"
+    elif cls is bool:
+        out += b"T" if o else b"F"
+    elif cls in int_types:
+        if -0x8000000000000000 <= o <= 0x7fffffffffffffff:
+            out += b"i" + _int64.pack(o)
+        else:
+            # Too big for 64 bits, so write the digits
+            _encode_str(b"I", str(o).encode("ascii"), out)
+    elif cls is float:
+        out += b"d" + _float64.pack(o)
+    elif cls is unicode_:
+        _encode_str(b"s", o.encode("utf-8"), out)
+    elif cls is bytes:
+        _encode_str(bytes_tag, o, out)
+    elif cls is list or cls is tuple:
+        _encode_list(o, out, typeids)
+    elif cls is array.array and o.typecode != "u":
+        _encode_array(o, out, b"a")
+    else:
+        try:
+            serializer = _serializer_cache[cls]
+        except KeyError:
+            serializer = _find_serializer(cls)
+        if serializer is _serialize_to_dict and isinstance(o, Serializable) \
+                and o.typeid and cls.to_dict == Serializable.to_dict:
+            _encode_serializable(o, out, typeids)
+        elif serializer is _serialize_dict:
+            out += b"m" + _uint32.pack(len(o))
+            for k, v in o.items():
+                _encode(k, out, typeids)
+                _encode(v, out, typeids)
+        elif serializer is _serialize_list:
+            _encode_list(o, out, typeids)
+        elif serializer is _serialize_array:
+            # Write the list, tuple, numpy array or array.array it wraps
+            _encode(o.seq, out, typeids)
+        elif serializer is _serialize_tolist and getattr(o, "ndim", 0) and \
+                not (o.dtype.hasobject or o.dtype.fields):
+            _encode_ndarray(o, out)
+        elif serializer is not None:
+            _encode(serializer(o, FrozenOrderedDict), out, typeids)
+        else:
+            # Subclasses of primitives and tuples are written as their base
+            for typ in _base_types:
+                if isinstance(o, typ):
+                    _encode(_as_base(o, typ), out, typeids)
+                    break
+            else:
+                raise TypeError("%r is not binary serializable" % (o,))
+
+
+def _as_base(o, typ):
+    if typ is int_types:
+        return int(o)
+    elif typ is dict:
+        return dict(o)
+    else:
+        return typ(o)
+
+
+def _encode_str(tag, s, out):
+    out += tag + _uint32.pack(len(s))
+    out += s
+
+
+def _encode_list(o, out, typeids):
+    if len(o) > 1:
+        # If the items are all the same primitive type, pack them in one go
+        types = set(map(type, o))
+        if len(types) == 1:
+            packer = _list_packers.get(types.pop(), None)
+            if packer is not None and packer(o, out):
+                return
+    out += b"l" + _uint32.pack(len(o))
+    for x in o:
+        _encode(x, out, typeids)
+
+
+def _pack_floats(o, out):
+    _encode_array(array.array("d", o), out, b"L")
+    return True
+
+
+def _pack_ints(o, out):
+    try:
+        a = array.array("q", o)
+    except OverflowError:
+        return False
+    _encode_array(a, out, b"L")
+    return True
+
+
+def _pack_bools(o, out):
+    out += b"L?"
+    _encode_str(b"", bytes(bytearray(o)), out)
+    return True
+
+
+def _pack_strs(o, out):
+    if o[0].__class__ is bytes:
+        sep = b"\x00"
+    else:
+        sep = u"\x00"
+    joined = sep.join(o)
+    if joined.count(sep) != len(o) - 1:
+        # Some of them contain the separator
+        return False
+    if sep.__class__ is unicode_:
+        joined = joined.encode("utf-8")
+    _encode_str(b"S", joined, out)
+    return True
+
+
+# dict mapping type -> function(o, out) that packs a list of that type and
+# returns True, or returns False if it can't
+_list_packers = {
+    float: _pack_floats,
+    bool: _pack_bools,
+    unicode_: _pack_strs,
+}
+if bytes_tag == b"s":
+    # Python 2 str is text too
+    _list_packers[bytes] = _pack_strs
+try:
+    array.array("q")
+except ValueError:
+    # Python 2 doesn't have 64-bit ints in array.array
+    pass
+else:
+    _list_packers[int] = _pack_ints
+
+
+def _encode_serializable(o, out, typeids):
+    index = typeids.get(o.typeid, None)
+    if index is None:
+        # First of its type, so write the typeid in full and give it the next
+        # index for any others of its type to use
+        typeids[o.typeid] = len(typeids)
+        _encode_str(b"O", o.typeid.encode("utf-8"), out)
+    else:
+        out += b"o" + _uint32.pack(index)
+    call_types = o.call_types
+    out += _uint32.pack(len(call_types))
+    for k in call_types:
+        _encode(getattr(o, k), out, typeids)
+
+
+def _encode_array(o, out, tag):
+    if sys.byteorder == "big" and o.itemsize > 1:
+        o = array.array(o.typecode, o)
+        o.byteswap()
+    if sys.version_info < (3,):
+        data = o.tostring()
+    else:
+        data = o.tobytes()
+    out += tag + o.typecode.encode("ascii")
+    _encode_str(b"", data, out)
+
+
+def _encode_ndarray(o, out):
+    if not o.flags.c_contiguous:
+        o = o.copy(order="C")
+    _encode_str(b"n", o.dtype.str.encode("ascii"), out)
+    out += _uint32.pack(o.ndim)
+    for dim in o.shape:
+        out += _uint64.pack(dim)
+    out += o.tobytes()
+
+
+def binary_decode(s, dict_cls=FrozenOrderedDict):
+    """Decode a message made by binary_encode()
+
+    Serializables are made by calling from_dict() on their registered
+    class, as are maps with a registered typeid, and numpy arrays are made
+    without copying so are read only and keep s alive.
+
+    Args:
+        s (bytes): The encoded message
+        dict_cls: The dict class to make decoded dictionaries with
+
+    Returns:
+        The decoded object
+    """
+    try:
+        assert s[:len(MAGIC)] == MAGIC, "bad header %r" % s[:len(MAGIC)]
+        o, pos = _decode(s, len(MAGIC), [], dict_cls)
+        assert pos == len(s), "%d extra bytes" % (len(s) - pos)
+        return o
+    except Exception as e:
+        raise ValueError("Error decoding binary object (%s)" % str(e))
+
+
+def _decode(s, pos, typeids, dict_cls):
+    tag = s[pos:pos + 1]
+    return _decoders[tag](s, pos + 1, typeids, dict_cls)
+
+
+def _decode_none(s, pos, typeids, dict_cls):
+    return None, pos
+
+
+def _decode_true(s, pos, typeids, dict_cls):
+    return True, pos
+
+
+def _decode_false(s, pos, typeids, dict_cls):
+    return False, pos
+
+
+def _decode_int(s, pos, typeids, dict_cls):
+    return _int64.unpack_from(s, pos)[0], pos + 8
+
+
+def _decode_big_int(s, pos, typeids, dict_cls):
+    digits, pos = _decode_bytes(s, pos, typeids, dict_cls)
+    return int(digits), pos
+
+
+def _decode_float(s, pos, typeids, dict_cls):
+    return _float64.unpack_from(s, pos)[0], pos + 8
+
+
+def _decode_bytes(s, pos, typeids, dict_cls):
+    n = _uint32.unpack_from(s, pos)[0]
+    pos += 4
+    return s[pos:pos + n], pos + n
+
+
+def _decode_str(s, pos, typeids, dict_cls):
+    data, pos = _decode_bytes(s, pos, typeids, dict_cls)
+    return data.decode("utf-8"), pos
+
+
+def _decode_list(s, pos, typeids, dict_cls):
+    n = _uint32.unpack_from(s, pos)[0]
+    pos += 4
+    items = []
+    for _ in range(n):
+        item, pos = _decode(s, pos, typeids, dict_cls)
+        items.append(item)
+    return items, pos
+
+
+def _decode_dict(s, pos, typeids, dict_cls):
+    n = _uint32.unpack_from(s, pos)[0]
+    pos += 4
+    pairs = []
+    typeid = None
+    for _ in range(n):
+        k, pos = _decode(s, pos, typeids, dict_cls)
+        v, pos = _decode(s, pos, typeids, dict_cls)
+        pairs.append((k, v))
+        if k == "typeid" and v.__class__ in (unicode_, bytes):
+            typeid = v
+    if typeid is not None:
+        # A Serializable that overrides to_dict() is written as a map, so
+        # make it again if its typeid is registered
+        subclass = Serializable._subcls_lookup.get(typeid, None)
+        if subclass is not None:
+            return subclass.from_dict(dict(pairs)), pos
+    return dict_cls(pairs), pos
+
+
+def _decode_new_serializable(s, pos, typeids, dict_cls):
+    typeid, pos = _decode_str(s, pos, typeids, dict_cls)
+    subclass = Serializable.lookup_subclass(dict(typeid=typeid))
+    entry = (subclass, list(subclass.call_types))
+    typeids.append(entry)
+    return _decode_fields(s, pos, typeids, dict_cls, entry)
+
+
+def _decode_serializable(s, pos, typeids, dict_cls):
+    index = _uint32.unpack_from(s, pos)[0]
+    return _decode_fields(s, pos + 4, typeids, dict_cls, typeids[index])
+
+
+def _decode_fields(s, pos, typeids, dict_cls, entry):
+    subclass, keys = entry
+    n = _uint32.unpack_from(s, pos)[0]
+    pos += 4
+    assert n == len(keys), "%s has %d fields, got %d" % (
+        subclass.typeid, len(keys), n)
+    d = {}
+    for k in keys:
+        d[k], pos = _decode(s, pos, typeids, dict_cls)
+    return subclass.from_dict(d), pos
+
+
+def _decode_array(s, pos, typeids, dict_cls):
+    typecode = s[pos:pos + 1].decode("ascii")
+    data, pos = _decode_bytes(s, pos + 1, typeids, dict_cls)
+    o = array.array(typecode)
+    if sys.version_info < (3,):
+        o.fromstring(data)
+    else:
+        o.frombytes(data)
+    if sys.byteorder == "big":
+        o.byteswap()
+    return o, pos
+
+
+def _decode_packed_list(s, pos, typeids, dict_cls):
+    if s[pos:pos + 1] == b"?":
+        data, pos = _decode_bytes(s, pos + 1, typeids, dict_cls)
+        return list(map(bool, bytearray(data))), pos
+    o, pos = _decode_array(s, pos, typeids, dict_cls)
+    return o.tolist(), pos
+
+
+def _decode_packed_strs(s, pos, typeids, dict_cls):
+    joined, pos = _decode_str(s, pos, typeids, dict_cls)
+    return joined.split(u"\x00"), pos
+
+
+def _decode_ndarray(s, pos, typeids, dict_cls):
+    import numpy as np
+    dtype, pos = _decode_bytes(s, pos, typeids, dict_cls)
+    dtype = np.dtype(dtype.decode("ascii"))
+    ndim = _uint32.unpack_from(s, pos)[0]
+    pos += 4
+    shape = struct.unpack_from("<%dQ" % ndim, s, pos)
+    pos += 8 * ndim
+    count = 1
+    for dim in shape:
+        count *= dim
+    o = np.frombuffer(s, dtype=dtype, count=count, offset=pos)
+    return o.reshape(shape), pos + count * dtype.itemsize
+
+
+# dict mapping tag -> function(s, pos, typeids, dict_cls) -> (o, pos)
+_decoders = {
+    b"N": _decode_none,
+    b"T": _decode_true,
+    b"F": _decode_false,
+    b"i": _decode_int,
+    b"I": _decode_big_int,
+    b"d": _decode_float,
+    b"s": _decode_str,
+    b"b": _decode_bytes,
+    b"l": _decode_list,
+    b"m": _decode_dict,
+    b"O": _decode_new_serializable,
+    b"o": _decode_serializable,
+    b"a": _decode_array,
+    b"L": _decode_packed_list,
+    b"S": _decode_packed_strs,
+    b"n": _decode_ndarray,
+}
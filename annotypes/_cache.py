@@ -0,0 +1,173 @@
+import atexit
+import json
+import os
+import sys
+
+from ._typing import TYPE_CHECKING
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Dict, Callable, Any, Optional
+
+# Change this if the format of what is cached changes
+CACHE_VERSION = 2
+
+# Set ANNOTYPES_NO_CACHE=1 in the environment to turn the cache off
+_enabled = not os.environ.get("ANNOTYPES_NO_CACHE")
+
+
+class FileCache(object):
+    """The type comments found in the functions of one source file"""
+    def __init__(self, path, stamp, comments):
+        # type: (str, list, Dict[str, Any]) -> None
+        # Where the cache is stored
+        self.path = path
+        # [mtime, size] of the source file that comments were found in
+        self.stamp = stamp
+        # dict "name:firstlineno" -> find_type_comments(f) for function f
+        self.comments = comments
+        # Whether comments has been added to since it was loaded
+        self.dirty = False
+
+
+# dict source filename -> FileCache, or None if it can't be cached
+_file_caches = {}  # type: Dict[str, Optional[FileCache]]
+
+
+def set_type_comment_cache(enabled):
+    # type: (bool) -> None
+    """Turn on or off the on-disk cache of type comments
+
+    When on, the type comments that make_annotations() finds in each source
+    file are stored in a .annotypes.json file in the __pycache__ directory
+    next to it, so later processes can skip reading and tokenizing the
+    source. It is on unless the ANNOTYPES_NO_CACHE environment variable is
+    set, and nothing is written if sys.dont_write_bytecode is True.
+
+    Args:
+        enabled: Whether to read and write the cache
+    """
+    global _enabled
+    _enabled = enabled
+    _file_caches.clear()
+
+
+def cached_type_comments(f, find):
+    # type: (Callable, Callable[[Callable], Any]) -> Any
+    """Return find(f), from the cache if the source of f is unchanged
+
+    Args:
+        f: The function to find the type comments of
+        find: The function that finds them from the source of f
+    """
+    if not _enabled:
+        return find(f)
+    code = f.__code__
+    if code.co_filename in _file_caches:
+        cache = _file_caches[code.co_filename]
+    else:
+        cache = _load(code.co_filename)
+    if cache is None:
+        return find(f)
+    key = "%s:%d" % (code.co_name, code.co_firstlineno)
+    try:
+        return cache.comments[key]
+    except KeyError:
+        comments = find(f)
+        cache.comments[key] = comments
+        cache.dirty = True
+        return comments
+
+
+def _stamp(filename):
+    # type: (str) -> Optional[list]
+    try:
+        st = os.stat(filename)
+    except OSError:
+        # Not a real file, like <string>
+        return None
+    return [st.st_mtime, st.st_size]
+
+
+def _load(filename):
+    # type: (str) -> Optional[FileCache]
+    stamp = _stamp(filename)
+    if stamp is None:
+        cache = None
+    else:
+        head, tail = os.path.split(filename)
+        path = os.path.join(head, "__pycache__", "%s.annotypes.json" % (
+            os.path.splitext(tail)[0]))
+        comments = {}  # type: Dict[str, Any]
+        try:
+            with open(path) as f:
+                saved = json.load(f)
+            if saved["version"] == CACHE_VERSION and \
+                    saved["stamp"] == stamp:
+                comments = saved["comments"]
+                if sys.version_info < (3,):
+                    # json gives us unicode, but the source gave us str
+                    comments = _native(comments)
+        except Exception:
+            # Missing or corrupt, so start again
+            pass
+        cache = FileCache(path, stamp, comments)
+    _file_caches[filename] = cache
+    return cache
+
+
+def _native(ob):
+    if isinstance(ob, list):
+        return [_native(x) for x in ob]
+    elif isinstance(ob, dict):
+        return dict((_native(k), _native(v)) for k, v in ob.items())
+    elif isinstance(ob, type(u"")):
+        return ob.encode("utf-8")
+    else:
+        return ob
+
+
+def save_type_comment_caches():
+    # type: () -> None
+    """Write any type comments found since the caches were loaded to disk
+
+    This is called when the interpreter exits, so only needs to be called
+    to save them earlier than that
+    """
+    if not _enabled or sys.dont_write_bytecode:
+        return
+    for filename, cache in _file_caches.items():
+        if cache and cache.dirty:
+            cache.dirty = False
+            if _stamp(filename) != cache.stamp:
+                # The source changed while we were running, so the comments
+                # may not match what is on disk any more
+                continue
+            _save(cache)
+
+
+def _save(cache):
+    # type: (FileCache) -> None
+    saved = dict(
+        version=CACHE_VERSION, stamp=cache.stamp, comments=cache.comments)
+    # Write to a temporary file and rename it so that other processes never
+    # see a partly written file
+    tmp = "%s.%d.tmp" % (cache.path, os.getpid())
+    try:
+        if not os.path.isdir(os.path.dirname(cache.path)):
+            os.mkdir(os.path.dirname(cache.path))
+        with open(tmp, "w") as f:
+            json.dump(saved, f)
+        if hasattr(os, "replace"):
+            os.replace(tmp, cache.path)
+        else:
+            # Python 2 rename will replace on posix
+            os.rename(tmp, cache.path)
+    except (IOError, OSError):
+        # Read only filesystem, or race with another process
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+atexit.register(save_type_comment_caches)
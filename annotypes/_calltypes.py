@@ -1,28 +1,52 @@
+import ast
 import inspect
+import linecache
 import re
+import sys
 import tokenize
 from collections import OrderedDict
 
 from ._anno import Anno, NO_DEFAULT, make_repr, anno_with_default
+from ._cache import cached_type_comments
+from ._coerce import make_instances, make_columns
 from ._compat import add_metaclass, getargspec, func_globals
 from ._typing import TYPE_CHECKING, GenericMeta, Any
 
+try:
+    import builtins
+except ImportError:
+    # python 2
+    import __builtin__ as builtins  # type: ignore
+
 if TYPE_CHECKING:  # pragma: no cover
-    from typing import Dict, Callable, Tuple, List
+    from typing import Dict, Callable, Tuple, List, Set, Optional
 
 type_re = re.compile('^# type: ([^-]*)( -> (.*))?$')
 
 
+class LazyClassAttribute(object):
+    """A class attribute that is made by calling f() the first time it is
+    accessed, then replaced on cls by the value f() returned"""
+    def __init__(self, cls, name, f):
+        self.cls = cls
+        self.name = name
+        self.f = f
+
+    def __get__(self, instance, owner):
+        value = self.f()
+        setattr(self.cls, self.name, value)
+        return value
+
+
 class CallTypesMeta(GenericMeta):
     def __init__(cls, name, bases, dct, **kwargs):
-        f = dct.get('__init__', None)
-        if f:
-            cls.call_types, _ = make_call_types(f, func_globals(f))
-        elif getattr(cls, "call_types", None) is not None:
-            cls.call_types = OrderedDict(cls.call_types)
-        else:
-            cls.call_types = OrderedDict()
-        cls.return_type = Anno("Class instance", name="Instance").set_typ(cls)
+        # Making call_types means parsing the source of __init__, so leave
+        # it until it is first needed
+        cls.call_types = LazyClassAttribute(
+            cls, "call_types", lambda: make_class_call_types(cls, dct))
+        cls.return_type = LazyClassAttribute(
+            cls, "return_type",
+            lambda: Anno("Class instance", name="Instance").set_typ(cls))
         super(CallTypesMeta, cls).__init__(name, bases, dct, **kwargs)
 
     def matches_type(self, cls):
@@ -37,10 +61,177 @@ class WithCallTypes(object):
     call_types = None  # type: Dict[str, Anno]
     return_type = None  # type: Anno
 
+    # No instance __dict__ here, so add_slots() subclasses don't have one
+    __slots__ = ()
+
     def __repr__(self):
         repr_str = make_repr(self, self.call_types)
         return repr_str
 
+    @classmethod
+    def from_columns(cls, **columns):
+        """Make an instance for each row of some columns of arguments
+
+        For classes decorated with coerce_call_types(), each column is type
+        checked and coerced once with its Anno, rather than once per
+        instance, which is where the speed up comes from. Other classes are
+        just called once per row, so are no faster than a loop. For example:
+
+        >>> Point.from_columns(axes=[["x"], ["x", "y"]], position=[1, [2, 3]])
+
+        Args:
+            columns: Map of argument name -> the value of it for each
+                instance. Arguments with defaults can be left out
+
+        Returns:
+            List of instances of cls
+        """
+        return make_instances(cls, columns)
+
+    @classmethod
+    def from_records(cls, records):
+        """Make an instance for each record, coercing arguments by column
+        if the class is decorated with coerce_call_types()
+
+        Args:
+            records: Each is a dict of arguments or a sequence of positional
+                arguments. Arguments with defaults can be left out
+
+        Returns:
+            List of instances of cls
+        """
+        return make_instances(cls, make_columns(cls, records))
+
+
+def add_slots(cls):
+    """Class decorator that remakes a WithCallTypes subclass with __slots__
+    made from its call_types, so instances have no __dict__
+
+    The attributes are stored in the slots rather than a dict per instance,
+    which uses much less memory when there are many instances. Instances can
+    still be weakly referenced. Class attributes with the same names as
+    arguments are removed, as slots can't have class defaults. Base classes
+    need __slots__ too, like WithCallTypes and Serializable have, or
+    instances still get a __dict__ from them, and subclasses need decorating
+    again. Put it under register_subclass() so the remade class is the one
+    registered. For example:
+
+    >>> @Serializable.register_subclass("epics:nt/NTScalar:1.0")
+    ... @add_slots
+    ... class NTScalar(Serializable):
+    ...     def __init__(self, value):
+    ...         # type: (AValue) -> None
+    ...         self.value = value
+    """
+    assert "__slots__" not in cls.__dict__, \
+        "%s already has __slots__" % cls.__name__
+    names = list(cls.call_types)
+    # Slots made by base classes don't need making again
+    existing = set()  # type: Set[str]
+    for base in cls.__mro__[1:]:
+        slots = base.__dict__.get("__slots__", ())
+        if isinstance(slots, str):
+            slots = [slots]
+        existing.update(slots)
+    dct = dict(cls.__dict__)
+    for name in names + ["__dict__", "__weakref__", "_serializer",
+                         "_deserializer"]:
+        # Slots can't have class attributes of the same name, and generated
+        # code for the old class shouldn't be used for the new one
+        dct.pop(name, None)
+    slots = [k for k in names if k not in existing]
+    if not any("__weakref__" in base.__dict__ for base in cls.__mro__[1:]):
+        # Keep instances weak referenceable
+        slots.append("__weakref__")
+    dct["__slots__"] = tuple(slots)
+    if hasattr(cls, "__qualname__"):
+        dct["__qualname__"] = cls.__qualname__
+    new = type(cls)(cls.__name__, cls.__bases__, dct)
+    # __init__ may have been replaced since call_types was made, like by
+    # coerce_call_types(), so keep the one that was made
+    new.call_types = cls.call_types
+    # Point the __class__ cells used by super() at the new class
+    functions = [getattr(f, "__func__", f) for f in dct.values()]
+    # Including the __init__ wrapped by coerce_call_types()
+    functions += [getattr(f, "_uncoerced", None) for f in functions]
+    for f in functions:
+        for cell in getattr(f, "__closure__", None) or ():
+            try:
+                contents = cell.cell_contents
+            except ValueError:
+                # Empty cell
+                continue
+            if contents is cls:
+                try:
+                    _set_cell(cell, new)
+                except (ImportError, AttributeError):
+                    raise TypeError(
+                        "Can't add_slots to %s as it uses super() or "
+                        "__class__, and this Python can't change what they "
+                        "refer to" % cls.__name__)
+    lookup = getattr(cls, "_subcls_lookup", {})
+    typeid = getattr(cls, "typeid", None)
+    if lookup.get(typeid, None) is cls:
+        # It was registered before being remade, so register the new one
+        lookup[typeid] = new
+    return new
+
+
+def _set_cell(cell, value):
+    # type: (Any, Any) -> None
+    if sys.version_info >= (3, 7):
+        cell.cell_contents = value
+    else:
+        # Before Python 3.7 cell_contents can only be set with the C API,
+        # which raises AttributeError if it isn't there, like on PyPy
+        import ctypes
+        ctypes.pythonapi.PyCell_Set(
+            ctypes.py_object(cell), ctypes.py_object(value))
+
+
+def make_class_call_types(cls, dct):
+    # type: (Any, Dict[str, Any]) -> Dict[str, Anno]
+    """Make the call_types dictionary for a WithCallTypes subclass
+
+    Args:
+        cls: The class to make call_types for
+        dct: The namespace the class was created with
+    """
+    f = dct.get('__init__', None)
+    if f:
+        call_types, _ = make_call_types(f, func_globals(f))
+        return call_types
+    elif "call_types" in dct:
+        call_types = dct["call_types"]
+    else:
+        call_types = getattr(super(cls, cls), "call_types", None)
+    if call_types is not None:
+        return OrderedDict(call_types)
+    else:
+        return OrderedDict()
+
+
+def evaluate_call_types(cls=WithCallTypes):
+    # type: (Any) -> None
+    """Make call_types and return_type now for cls and all its subclasses,
+    rather than waiting until they are first accessed
+
+    This lets tests check every annotation at once, raising the error from
+    the first that is not valid
+
+    Args:
+        cls: The WithCallTypes subclass to start from
+    """
+    stack = [cls]
+    seen = set()  # type: Set[Any]
+    while stack:
+        cls = stack.pop()
+        if cls not in seen:
+            seen.add(cls)
+            getattr(cls, "call_types")
+            getattr(cls, "return_type")
+            stack += type.__subclasses__(cls)
+
 
 def add_call_types(f):
     f.call_types, f.return_type = make_call_types(f, func_globals(f))
@@ -103,12 +294,6 @@ class EchoStr(str):
         return "%s.%s" % (self, item)
 
 
-class EchoDict(dict):
-    # A fake globals dictionary that just returns the string back
-    def __getitem__(self, item):
-        return EchoStr(item)
-
-
 def make_annotations(f, globals_d=None):
     # type: (Callable, Dict) -> Dict[str, Any]
     """Create an annotations dictionary from Python2 type comments
@@ -121,64 +306,200 @@ def make_annotations(f, globals_d=None):
             specified then make the annotations dict contain strings rather
             than the looked up objects
     """
-    locals_d = {}  # type: Dict[str, Any]
     if globals_d is None:
         # If not given a globals_d then we should just populate annotations with
-        # the strings in the type comment.
-        globals_d = {}
-        # The current approach is to use eval, which means manufacturing a
-        # dict like object that will just echo the string back to you. This
-        # has a number of complexities for somthing like numpy.number or
-        # Callable[..., int], which are handled in EchoStr above, so it might be
-        # better off as an ast.parse in the future...
-        locals_d = EchoDict()
-    lines, _ = inspect.getsourcelines(f)
+        # the strings in the type comment, so look up each name as an EchoStr
+        # that gives back a string when indexed or has attributes got
+        lookup = EchoStr  # type: Callable[[str], Any]
+    else:
+        lookup = make_lookup(globals_d)
+    comments, found = cached_type_comments(f, find_type_comments)
     arg_spec = getargspec(f)
     args = list(arg_spec.args)
     if arg_spec.varargs is not None:
         args.append(arg_spec.varargs)
     if arg_spec.keywords is not None:
         args.append(arg_spec.keywords)
-    it = iter(lines)
     types = []  # type: List
-    found = None
-    for token in tokenize.generate_tokens(lambda: next(it)):
-        typ, string, start, end, line = token
-        if typ == tokenize.COMMENT:
-            found = type_re.match(string)
-            if found:
-                parts = found.groups()
-                # (...) is used to represent all the args so far
-                if parts[0] != "(...)":
-                    expr = parts[0].replace("*", "")
-                    try:
-                        ob = eval(expr, globals_d, locals_d)
-                    except Exception as e:
-                        raise ValueError(
-                            "Error evaluating %r: %s" % (expr, e))
-                    if isinstance(ob, tuple):
-                        # We got more than one argument
-                        types += list(ob)
-                    else:
-                        # We got a single argument
-                        types.append(ob)
-                if parts[1]:
-                    # Got a return, done
-                    try:
-                        ob = eval(parts[2], globals_d, locals_d)
-                    except Exception as e:
-                        raise ValueError(
-                            "Error evaluating %r: %s" % (parts[2], e))
-                    if args and args[0] in ["self", "cls"]:
-                        # Allow the first argument to be inferred
-                        if len(args) == len(types) + 1:
-                            args = args[1:]
-                    assert len(args) == len(types), \
-                        "Args %r Types %r length mismatch" % (args, types)
-                    ret = dict(zip(args, types))
-                    ret["return"] = ob
-                    return ret
+    for arg_types, return_type in comments:
+        # (...) is used to represent all the args so far
+        if arg_types != "(...)":
+            expr = arg_types.replace("*", "")
+            try:
+                ob = compile_type_expression(expr)(lookup)
+            except Exception as e:
+                raise ValueError(
+                    "Error evaluating %r: %s" % (expr, e))
+            if isinstance(ob, tuple):
+                # We got more than one argument
+                types += list(ob)
+            else:
+                # We got a single argument
+                types.append(ob)
+        if return_type is not None:
+            # Got a return, done
+            try:
+                ob = compile_type_expression(return_type)(lookup)
+            except Exception as e:
+                raise ValueError(
+                    "Error evaluating %r: %s" % (return_type, e))
+            if args and args[0] in ["self", "cls"]:
+                # Allow the first argument to be inferred
+                if len(args) == len(types) + 1:
+                    args = args[1:]
+            assert len(args) == len(types), \
+                "Args %r Types %r length mismatch" % (args, types)
+            ret = dict(zip(args, types))
+            ret["return"] = ob
+            return ret
     if found:
         # If we have ever found a type comment, but not the return value, error
         raise ValueError("Got to the end of the function without seeing ->")
     return {}
+
+
+def find_type_comments(f):
+    # type: (Callable) -> Tuple[List[List[Optional[str]]], bool]
+    """Find the type comments in the signature of f, and in the comments
+    after it before the first statement of the body
+
+    Returns:
+        A list of [arg_types, return_type] strings for each type comment up
+        to and including the first with a return type, with return_type None
+        for those without. Then whether the last comment seen was a type
+        comment.
+    """
+    code = getattr(f, "__code__", None)
+    lines = []  # type: List[str]
+    if code is not None:
+        lines = linecache.getlines(code.co_filename, func_globals(f))
+    if lines:
+        # Start at the def, or the decorators before it
+        it = iter(lines[code.co_firstlineno - 1:])
+    else:
+        # Let inspect find it, or raise the error saying why it can't
+        it = iter(inspect.getsourcelines(f)[0])
+    comments = []  # type: List[List[Optional[str]]]
+    found = None
+    # 0: before def, 1: in the signature, 2: after the colon that ends it,
+    # 3: on the lines after it
+    state = 0
+    depth = 0
+    docstring = False
+    for token in tokenize.generate_tokens(lambda: next(it)):
+        typ, string = token[:2]
+        if typ == tokenize.COMMENT:
+            if state > 0:
+                found = type_re.match(string)
+                if found:
+                    parts = found.groups()
+                    if parts[1]:
+                        # Got a return, done
+                        comments.append([parts[0], parts[2]])
+                        return comments, True
+                    else:
+                        comments.append([parts[0], None])
+        elif state == 0:
+            if typ == tokenize.NAME and string == "def":
+                state = 1
+        elif state == 1:
+            if typ == tokenize.OP:
+                if string in "([{":
+                    depth += 1
+                elif string in ")]}":
+                    depth -= 1
+                elif string == ":" and depth == 0:
+                    state = 2
+        elif state == 2:
+            if typ == tokenize.NEWLINE:
+                state = 3
+        elif typ == tokenize.STRING and not docstring:
+            # Skip the docstring, but only the first one
+            docstring = True
+        elif typ not in (tokenize.NL, tokenize.NEWLINE, tokenize.INDENT):
+            # Got to the first statement of the body
+            break
+    return comments, bool(found)
+
+
+def make_lookup(globals_d):
+    # type: (Dict[str, Any]) -> Callable[[str], Any]
+    """Make a function that looks up a name like eval would in globals_d"""
+    def lookup(name):
+        try:
+            return globals_d[name]
+        except KeyError:
+            try:
+                return getattr(builtins, name)
+            except AttributeError:
+                raise NameError("name %r is not defined" % name)
+    return lookup
+
+
+def compile_type_expression(expr):
+    # type: (str) -> Callable[[Callable[[str], Any]], Any]
+    """Parse the expression in a type comment to a function that takes a
+    function to look up names in, and returns what the expression gives
+
+    The result is cached, so each expression is only parsed once
+
+    Args:
+        expr: The expression, like "Union[AThing, Sequence[str]]"
+    """
+    try:
+        return _expressions[expr]
+    except KeyError:
+        tree = ast.parse(expr, "<string>", "eval")  # type: Any
+        resolve = _compile_node(tree.body)
+        _expressions[expr] = resolve
+        return resolve
+
+
+def _constant(value):
+    return lambda lookup: value
+
+
+def _compile_node(node):
+    if isinstance(node, ast.Name):
+        name = node.id
+        if name == "None":
+            # Python 2 parses None as a name
+            return _constant(None)
+        return lambda lookup: lookup(name)
+    elif isinstance(node, ast.Attribute):
+        value = _compile_node(node.value)
+        attr = node.attr
+        return lambda lookup: getattr(value(lookup), attr)
+    elif isinstance(node, ast.Subscript):
+        value = _compile_node(node.value)
+        index = _compile_node(node.slice)
+        return lambda lookup: value(lookup)[index(lookup)]
+    elif isinstance(node, ast.Index):
+        # Python < 3.9 wraps subscripts in Index
+        return _compile_node(node.value)
+    elif isinstance(node, (ast.Tuple, getattr(ast, "ExtSlice", ast.Tuple))):
+        # Python 2 makes X[..., int] an ExtSlice
+        items = [_compile_node(x) for x in getattr(node, "elts", None) or
+                 getattr(node, "dims")]
+        return lambda lookup: tuple(item(lookup) for item in items)
+    elif isinstance(node, ast.List):
+        items = [_compile_node(x) for x in node.elts]
+        return lambda lookup: [item(lookup) for item in items]
+    elif isinstance(node, _constant_nodes):
+        for field in ("value", "n", "s"):
+            if hasattr(node, field):
+                return _constant(getattr(node, field))
+        # Ellipsis has no fields
+        return _constant(Ellipsis)
+    else:
+        raise SyntaxError("%s not supported in type comments" %
+                          type(node).__name__)
+
+
+# The ast nodes that give a constant, which change between Python versions
+_constant_nodes = tuple(getattr(ast, name) for name in (
+    "Constant", "Num", "Str", "Bytes", "NameConstant", "Ellipsis")
+    if hasattr(ast, name))
+
+# dict expression string -> function made by _compile_node for it
+_expressions = {}  # type: Dict[str, Callable[[Callable[[str], Any]], Any]]
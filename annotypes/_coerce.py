@@ -0,0 +1,257 @@
+import inspect
+
+from . import _array
+from ._anno import NO_DEFAULT
+from ._array import Array, to_array
+from ._compat import getargspec, str_
+from ._typing import TYPE_CHECKING
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Dict, Any, List, Sequence
+
+
+def coerce_call_types(cls):
+    """Class decorator that makes __init__ coerce each argument with its Anno
+
+    This generates a single function from call_types that does what calling
+    each Anno on its argument would do, so __init__ can just store its
+    arguments. Array annotated arguments are made into Arrays, arguments
+    annotated with a class are passed to it unless they are already an
+    instance of it, and None is passed through for arguments that default to
+    None. Defaults are coerced once when the class is decorated.
+
+    For example:
+
+    >>> @coerce_call_types
+    ... class Point(WithCallTypes):
+    ...     def __init__(self, axes, position):
+    ...         # type: (AAxes, APosition) -> None
+    ...         self.axes = axes  # already an Array[str]
+    ...         self.position = position  # already an Array[float]
+    """
+    init = getattr(cls.__init__, "__func__", cls.__init__)
+    arg_spec = getargspec(init)
+    args = [a for a in arg_spec.args if a != "self"]
+    call_types = cls.call_types
+    assert args == list(call_types), \
+        "Args %s don't match call_types %s" % (args, list(call_types))
+    namespace = dict(
+        _init=init, _to_array=to_array, _new=object.__new__, _str=str_,
+        _array=_array
+    )  # type: Dict[str, Any]
+    params = ["self"]
+    lines = []  # type: List[str]
+    for i, (v, anno) in enumerate(call_types.items()):
+        assert not v.startswith("_"), \
+            "Can't coerce argument %r starting with underscore" % v
+        default = anno.default
+        if anno.is_array:
+            namespace["_c%d" % i] = anno._array_cls
+            # Inline the fast paths of to_array for lists and strings, which
+            # can't be used when validating or packing lists
+            lines += [
+                "    _c = %s.__class__" % v,
+                "    if _c is _c%d:" % i,
+                "        pass",
+                "    elif not _array._wrap_lists:",
+                "        %s = _to_array(_c%d, %s)" % (v, i, v),
+                "    elif _c is list and %s:" % v,
+                "        _a = _new(_c%d)" % i,
+                "        _a.seq = %s" % v,
+                "        %s = _a" % v,
+                "    elif _c is str:",
+                "        _a = _new(_c%d)" % i,
+                "        _a.seq = [%s]" % v,
+                "        %s = _a" % v,
+                "    else:",
+                "        %s = _to_array(_c%d, %s)" % (v, i, v)]
+            if default is not NO_DEFAULT and default is not None:
+                default = to_array(anno._array_cls, default)
+        elif not anno.is_mapping and inspect.isclass(anno.typ):
+            typ = anno.typ
+            namespace["_t%d" % i] = typ
+            if typ is str:
+                # Python 2 may give us unicode as a str, which str() would
+                # fail to convert if it isn't ascii
+                check = "_str"
+            else:
+                check = "_t%d" % i
+            if default is None:
+                # Optional, so let None through
+                check += ") and %s is not None" % v
+            else:
+                check += ")"
+            lines += [
+                "    if %s.__class__ is not _t%d and " % (v, i) +
+                "not isinstance(%s, %s:" % (v, check),
+                "        %s = _t%d(%s)" % (v, i, v)]
+            if default is not NO_DEFAULT and default is not None and \
+                    not isinstance(default, typ):
+                default = typ(default)
+        if default is NO_DEFAULT:
+            params.append(v)
+        else:
+            namespace["_d%d" % i] = default
+            params.append("%s=_d%d" % (v, i))
+    call_args = ["self"] + list(call_types)
+    if arg_spec.varargs:
+        params.append("*%s" % arg_spec.varargs)
+        call_args.append("*%s" % arg_spec.varargs)
+    if arg_spec.keywords:
+        params.append("**%s" % arg_spec.keywords)
+        call_args.append("**%s" % arg_spec.keywords)
+    lines.insert(0, "def __init__(%s):" % ", ".join(params))
+    lines.append("    _init(%s)" % ", ".join(call_args))
+    code = compile(
+        "\n".join(lines), "<%s coercing __init__>" % cls.__name__, "exec")
+    exec(code, namespace)
+    wrapper = namespace["__init__"]
+    wrapper.__doc__ = init.__doc__
+    wrapper.__wrapped__ = init
+    # So make_instances() can skip the coercion if it has already been done
+    wrapper._uncoerced = init
+    cls.__init__ = wrapper
+    return cls
+
+
+def coerce_column(anno, values):
+    # type: (Any, Any) -> List
+    """Coerce a column of values for one argument with its Anno
+
+    This does what calling anno on each value would do, but checks the whole
+    column first so a column that is already the right type is not copied
+    element by element
+
+    Args:
+        anno: The Anno of the argument
+        values: The value of the argument for each instance
+    """
+    if isinstance(values, Array):
+        values = values.seq
+    if anno.is_array:
+        # Keep numpy rows as they are, they will be wrapped in an Array
+        values = list(values)
+        typ = anno._array_cls
+        new = object.__new__
+        fast = _array._wrap_lists
+        for i, v in enumerate(values):
+            c = v.__class__
+            if c is typ:
+                continue
+            # Inline the fast paths of to_array for lists and strings
+            elif c is list and v and fast:
+                a = new(typ)
+                a.seq = v
+            elif c is str and fast:
+                a = new(typ)
+                a.seq = [v]
+            else:
+                a = to_array(typ, v)
+            values[i] = a
+    else:
+        if hasattr(values, "tolist"):
+            # Numpy column, so get the Python scalars out in one go
+            values = values.tolist()
+        else:
+            values = list(values)
+        typ = anno.typ
+        if not anno.is_mapping and inspect.isclass(typ) and \
+                any(v.__class__ is not typ for v in values):
+            check = str_ if typ is str else typ
+            optional = anno.default is None
+            values = [
+                v if v.__class__ is typ or isinstance(v, check) or (
+                    optional and v is None) else typ(v) for v in values]
+    return values
+
+
+def make_instances(cls, columns):
+    # type: (Any, Dict[str, Sequence]) -> List
+    """Make an instance of cls for each row of columns
+
+    If cls has been decorated with coerce_call_types() then each column is
+    coerced once with coerce_column(), and the original __init__ is called
+    for each row with the coerced arguments. Otherwise __init__ may do
+    anything with its arguments, so cls is called for each row.
+
+    Args:
+        cls: The WithCallTypes subclass to make instances of
+        columns: Map of argument name -> the value of it for each instance.
+            Arguments with defaults can be left out. If it is empty then
+            no instances are made
+    """
+    if not columns:
+        return []
+    unknown = [k for k in columns if k not in cls.call_types]
+    if unknown:
+        raise TypeError("%s has no arguments %s" % (cls.__name__, unknown))
+    init = getattr(cls.__init__, "_uncoerced", None)
+    if cls.__new__ is not object.__new__:
+        # Can't skip calling cls
+        init = None
+    lengths = dict((k, len(v)) for k, v in columns.items())
+    if len(set(lengths.values())) > 1:
+        raise ValueError("Column lengths %s don't match" % lengths)
+    n = lengths.popitem()[1]
+    args = []  # type: List[Any]
+    for k, anno in cls.call_types.items():
+        if k in columns:
+            values = columns[k]
+            if init:
+                values = coerce_column(anno, values)
+        elif anno.default is NO_DEFAULT:
+            raise TypeError("%s requires column %r" % (cls.__name__, k))
+        elif init:
+            # Coerce the default once, and share it between the instances
+            values = coerce_column(anno, [anno.default]) * n
+        else:
+            values = [anno.default] * n
+        args.append(values)
+    if init is None:
+        return [cls(*row) for row in zip(*args)]
+    new = object.__new__
+    instances = []
+    for row in zip(*args):
+        inst = new(cls)
+        init(inst, *row)
+        instances.append(inst)
+    return instances
+
+
+def make_columns(cls, records):
+    # type: (Any, Sequence) -> Dict[str, List]
+    """Turn records into the columns that make_instances() takes
+
+    Args:
+        cls: The WithCallTypes subclass the records are for
+        records: Each is a dict of arguments or a sequence of positional
+            arguments for cls. Arguments with defaults can be left out
+    """
+    names = list(cls.call_types)
+    missing = object()
+    rows = []
+    for record in records:
+        if isinstance(record, dict):
+            unknown = [k for k in record if k not in cls.call_types]
+            if unknown:
+                raise TypeError(
+                    "%s has no arguments %s" % (cls.__name__, unknown))
+            row = [record.get(k, missing) for k in names]
+        else:
+            row = list(record)
+            if len(row) > len(names):
+                raise TypeError("%s takes %d arguments, got %d" % (
+                    cls.__name__, len(names), len(row)))
+            row += [missing] * (len(names) - len(row))
+        for i, v in enumerate(row):
+            if v is missing:
+                default = cls.call_types[names[i]].default
+                if default is NO_DEFAULT:
+                    raise TypeError(
+                        "%s requires argument %r" % (cls.__name__, names[i]))
+                row[i] = default
+        rows.append(row)
+    if rows:
+        return dict(zip(names, (list(c) for c in zip(*rows))))
+    else:
+        return {}
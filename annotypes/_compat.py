@@ -32,6 +32,20 @@ def func_globals(f):
 if sys.version_info < (3,):
     # python 2
     str_ = basestring
+    # The types that json can serialize without help
+    primitive_types = (type(None), bool, int, long, float, str, unicode)
 else:
     # python 3
-    str_ = str
\ No newline at end of file
+    str_ = str
+    # The types that json can serialize without help
+    primitive_types = (type(None), bool, int, float, str)
+
+def primitive_key(v):
+    """Return a key for a primitive value that only equals the key of the
+    same value, so 1, 1.0 and True differ, as do 0.0 and -0.0, while NaN
+    matches NaN"""
+    cls = v.__class__
+    if cls is float:
+        return cls, repr(v)
+    else:
+        return cls, v
@@ -0,0 +1,163 @@
+from ._frozen_dict import FrozenOrderedDict
+from ._serializable import Serializable, serialize_object, \
+    deserialize_object, cached_by_class
+from ._typing import TYPE_CHECKING
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Type, List
+
+
+class TrackedSerializable(Serializable):
+    """Serializable that records which of its call_types attributes have been
+    set, so changes() can return just what has changed since it was last
+    called. For example:
+
+    >>> block.health = "Fault"
+    >>> changes = block.changes()
+    >>> changes
+    [[['health'], 'Fault']]
+    >>> remote = apply_changes(remote, changes)
+    """
+
+    def __setattr__(self, name, value):
+        super(TrackedSerializable, self).__setattr__(name, value)
+        if name in self.call_types:
+            try:
+                self.__dict__["_changed"].add(name)
+            except KeyError:
+                self.__dict__["_changed"] = set([name])
+
+    def changes(self, dict_cls=FrozenOrderedDict):
+        # type: (Type[dict]) -> List[List]
+        """Return what has changed since the last call, and start tracking
+        changes again from now
+
+        TrackedSerializable attributes, and those in dict attributes, are
+        searched for changes too. Other attributes are sent whole when they
+        are set. The first call returns the whole object, as every attribute
+        was set when it was made.
+
+        Returns:
+            List of [path, value] changes, where path is a list of attribute
+            names and dict keys, and value is the serialized value to set
+            there. A path of [] means the whole object
+        """
+        changes = []  # type: List[List]
+        _add_changes(self, [], changes, dict_cls)
+        return changes
+
+
+# What to do with instances of a class when looking for changes
+SKIP, TRACKED, DICT = range(3)
+
+
+@cached_by_class
+def _kind(cls):
+    # type: (type) -> int
+    if issubclass(cls, TrackedSerializable):
+        return TRACKED
+    elif issubclass(cls, dict):
+        return DICT
+    else:
+        return SKIP
+
+
+def _add_changes(o, path, changes, dict_cls):
+    kind = _kind(o.__class__)
+    if kind == TRACKED:
+        changed = o.__dict__.pop("_changed", None)
+        if changed and len(changed) == len(o.call_types):
+            # Everything has been set, probably because it is new, so send
+            # it whole
+            changes.append([path, serialize_object(o, dict_cls)])
+            for k in o.call_types:
+                _forget_changes(getattr(o, k))
+            return
+        for k in o.call_types:
+            v = getattr(o, k)
+            if changed and k in changed:
+                changes.append([path + [k], serialize_object(v, dict_cls)])
+                _forget_changes(v)
+            elif _kind(v.__class__) != SKIP:
+                _add_changes(v, path + [k], changes, dict_cls)
+    elif kind == DICT:
+        for k, v in o.items():
+            if _kind(v.__class__) != SKIP:
+                _add_changes(v, path + [k], changes, dict_cls)
+
+
+def _forget_changes(o):
+    # o has been sent whole, so forget any changes inside it
+    kind = _kind(o.__class__)
+    if kind == TRACKED:
+        o.__dict__.pop("_changed", None)
+        for k in o.call_types:
+            _forget_changes(getattr(o, k))
+    elif kind == DICT:
+        for v in o.values():
+            _forget_changes(v)
+
+
+def apply_changes(target, changes):
+    """Apply the changes from TrackedSerializable.changes() to a copy of the
+    object on the receiving side
+
+    Args:
+        target: Either the serialized dict of the object, which will have
+            the serialized changes put in it, or a Serializable, which will
+            have the changes deserialized and set as attributes
+        changes: List of [path, value] changes
+
+    Returns:
+        The changed target. Any FrozenOrderedDict on a changed path is
+        replaced rather than changed, so this may not be the target passed
+    """
+    objects = not isinstance(target, dict)
+    for path, value in changes:
+        target = _apply(target, path, value, None, objects)
+    return target
+
+
+def _apply(target, path, value, anno, objects):
+    if not path:
+        if objects:
+            return _deserialize_value(value, anno)
+        else:
+            return value
+    key = path[0]
+    if isinstance(target, Serializable):
+        child = getattr(target, key)
+        new = _apply(child, path[1:], value, target.call_types[key], objects)
+        if new is not child:
+            setattr(target, key, new)
+        return target
+    else:
+        child = target.get(key, None)
+        new = _apply(child, path[1:], value, None, objects)
+        if new is child:
+            return target
+        elif isinstance(target, FrozenOrderedDict):
+            # Can't change it, so make a new one with the key replaced
+            pairs = list(target.items())
+            if key in target:
+                pairs = [(k, new if k == key else v) for k, v in pairs]
+            else:
+                pairs.append((key, new))
+            return FrozenOrderedDict(pairs)
+        else:
+            target[key] = new
+            return target
+
+
+def _deserialize_value(value, anno):
+    # Turn a serialized value back into what would have been set
+    if isinstance(value, dict):
+        if "typeid" in value:
+            return deserialize_object(value)
+        else:
+            return value.__class__(
+                (k, _deserialize_value(v, None)) for k, v in value.items())
+    elif anno is not None and anno.is_array:
+        return anno(value)
+    else:
+        return value
@@ -1,51 +1,96 @@
+import sys
+
+
 def not_supported(self, *args, **kwargs):
     raise TypeError("FrozenOrderedDict is immutable")
 
 
-class FrozenOrderedDict(dict):
-    """Absolutely minimal implementation of an OrderedDict, frozen at init to
-    give better performance than the one in collections"""
-    def __init__(self, seq=()):
-        super(FrozenOrderedDict, self).__init__()
-        keys = []
-        setitem = super(FrozenOrderedDict, self).__setitem__
-        append = keys.append
-        for k, v in seq:
-            setitem(k, v)
-            append(k)
-        self._keys = keys
+def frozen_hash(self):
+    # It can't change, so the hash only needs making once. Equal dicts may
+    # have different orders, so the hash must ignore the order
+    try:
+        return self._hash
+    except AttributeError:
+        self._hash = hash(frozenset(self.items()))
+        return self._hash
+
+
+def frozen_reduce(self):
+    # The default for dict subclasses sets each item after creation
+    return self.__class__, (list(self.items()),)
+
+
+if sys.version_info >= (3, 7):
+    # dicts keep insertion order, so it only needs to stop changes
+    class FrozenOrderedDict(dict):
+        """Dict that keeps the order of the items it was made with, and can't
+        be changed after it is made"""
+        __setitem__ = not_supported
+        __delitem__ = not_supported
+        __hash__ = frozen_hash  # type: ignore
+        __reduce__ = frozen_reduce
+
+        def iteritems(self):
+            return iter(self.items())
+
+        iterkeys = dict.__iter__
+
+        def itervalues(self):
+            return iter(self.values())
+
+        clear = not_supported
+        copy = not_supported
+        pop = not_supported
+        popitem = not_supported
+        setdefault = not_supported
+        update = not_supported
+else:
+    class FrozenOrderedDict(dict):  # type: ignore
+        """Absolutely minimal implementation of an OrderedDict, frozen at
+        init to give better performance than the one in collections"""
+        def __init__(self, seq=()):
+            super(FrozenOrderedDict, self).__init__()
+            keys = []
+            setitem = super(FrozenOrderedDict, self).__setitem__
+            append = keys.append
+            for k, v in seq:
+                setitem(k, v)
+                append(k)
+            self._keys = keys
 
-    __setitem__ = not_supported
-    __delitem__ = not_supported
+        __setitem__ = not_supported
+        __delitem__ = not_supported
+        __hash__ = frozen_hash
+        __reduce__ = frozen_reduce
 
-    def __iter__(self):
-        return (k for k in self._keys)
+        def __iter__(self):
+            return iter(self._keys)
 
-    clear = not_supported
-    copy = not_supported
+        clear = not_supported
+        copy = not_supported
 
-    def items(self):
-        return [(k, self[k]) for k in self._keys]
+        def items(self):
+            return [(k, self[k]) for k in self._keys]
 
-    def iteritems(self):
-        return ((k, self[k]) for k in self._keys)
+        def iteritems(self):
+            return ((k, self[k]) for k in self._keys)
 
-    iterkeys = __iter__
+        iterkeys = __iter__
 
-    def itervalues(self):
-        return (self[k] for k in self._keys)
+        def itervalues(self):
+            return (self[k] for k in self._keys)
 
-    def keys(self):
-        return self._keys
+        def keys(self):
+            return self._keys
 
-    pop = not_supported
-    popitem = not_supported
-    setdefault = not_supported
-    update = not_supported
+        pop = not_supported
+        popitem = not_supported
+        setdefault = not_supported
+        update = not_supported
 
-    def values(self):
-        return [self[k] for k in self._keys]
+        def values(self):
+            return [self[k] for k in self._keys]
 
-    viewitems = not_supported
-    viewkeys = not_supported
-    viewvalues = not_supported
+        viewitems = not_supported
+        viewkeys = not_supported
+        viewvalues = not_supported
@@ -0,0 +1,102 @@
+from ._array import Array, is_buffer
+from ._compat import primitive_types
+from ._frozen_dict import FrozenOrderedDict
+from ._serializable import Serializable, cached_by_class
+from ._typing import TYPE_CHECKING
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Type, Dict, Any, List, Tuple
+
+
+class MemoizedSerializable(Serializable):
+    """Serializable that keeps the FrozenOrderedDict made by to_dict() until
+    one of its call_types attributes is set
+
+    The dicts of MemoizedSerializable children are reused in the parent, so
+    serializing a tree again only makes new dicts for the objects that have
+    changed and their parents. Attributes should be replaced rather than
+    changed in place, as changes inside a list or dict are not seen. Objects
+    with other Serializables in them are not memoized, as setting the
+    attributes of those is not seen either.
+    """
+
+    def __setattr__(self, name, value):
+        super(MemoizedSerializable, self).__setattr__(name, value)
+        if name in self.call_types:
+            self.__dict__.pop("_memo", None)
+
+    def to_dict(self, dict_cls=FrozenOrderedDict):
+        # type: (Type[dict]) -> Dict[str, Any]
+        if dict_cls is not FrozenOrderedDict:
+            # Mutable, so make a new one each time
+            return super(MemoizedSerializable, self).to_dict(dict_cls)
+        memo = self.__dict__.get("_memo", None)
+        if memo is not None:
+            memo_d, memo_children = memo
+            for child, child_d in memo_children:
+                if child.to_dict() is not child_d:
+                    # A child has changed, so make it again
+                    break
+            else:
+                return memo_d
+        d = super(MemoizedSerializable, self).to_dict(dict_cls)
+        children = []  # type: List[Tuple[Any, Any]]
+        for k in self.call_types:
+            if not _find_children(getattr(self, k), d[k], children):
+                # A child could change without us knowing, so make it again
+                # each time
+                return d
+        self.__dict__["_memo"] = (d, children)
+        return d
+
+
+# What _find_children() does with instances of a class
+OTHER, MEMOIZED, UNTRACKED, CONTAINER = range(4)
+
+
+@cached_by_class
+def _kind(cls):
+    # type: (type) -> int
+    if issubclass(cls, MemoizedSerializable):
+        return MEMOIZED
+    elif hasattr(cls, "to_dict"):
+        return UNTRACKED
+    elif issubclass(cls, (dict, list, tuple, Array)):
+        return CONTAINER
+    else:
+        return OTHER
+
+
+@cached_by_class
+def _may_hold_children(typ):
+    # type: (Any) -> bool
+    # Whether an Array of typ could have MemoizedSerializables in it
+    return not (typ in primitive_types or hasattr(typ, "dtype"))
+
+
+def _find_children(o, serialized, children):
+    # type: (Any, Any, List[Tuple[Any, Any]]) -> bool
+    # Add the MemoizedSerializables in o and their dicts in serialized to
+    # children, so they can be checked to see if they have changed. Return
+    # False if o has something else serialized with to_dict() in it, as
+    # setting its attributes wouldn't be seen
+    kind = _kind(o.__class__)
+    if kind == MEMOIZED:
+        children.append((o, serialized))
+    elif kind == UNTRACKED:
+        return False
+    elif kind == OTHER:
+        pass
+    elif isinstance(o, dict):
+        for k, v in o.items():
+            if not _find_children(v, serialized[k], children):
+                return False
+    elif isinstance(o, Array) and (
+            not _may_hold_children(o.typ) or is_buffer(o.seq)):
+        # Numbers or strings, so don't look through them
+        pass
+    elif isinstance(serialized, list) and len(o) == len(serialized):
+        for v, s in zip(o, serialized):
+            if not _find_children(v, s, children):
+                return False
+    return True
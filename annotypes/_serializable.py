@@ -1,8 +1,12 @@
 import inspect
 import json
+import keyword
+import re
+import weakref
 
-from ._array import Array
+from ._array import Array, array_cls, array_from_buffer, ARRAY_BUFFER_TYPEID
 from ._calltypes import WithCallTypes
+from ._compat import primitive_types, primitive_key, str_
 from ._typing import TypeVar, TYPE_CHECKING
 from ._frozen_dict import FrozenOrderedDict
 
@@ -14,7 +18,18 @@ else:
     has_enum = True
 
 if TYPE_CHECKING:
-    from typing import Type, Dict, Any, Union, List, Tuple
+    from typing import Type, Dict, Any, Union, List, Tuple, Callable, \
+        Optional, MutableMapping
+    Serializer = Callable[[Any, Type[dict]], Any]
+    Deserializer = Callable[[List[Tuple[str, Any]], Type[dict]], Any]
+
+# Attribute names that can be used as self.<name> in generated code
+identifier_re = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def is_identifier(name):
+    # type: (str) -> bool
+    return bool(identifier_re.match(name)) and not keyword.iskeyword(name)
 
 
 def stringify_error(e):
@@ -22,68 +37,477 @@ def stringify_error(e):
     return "%s: %s" % (type(e).__name__, str(e))
 
 
+def cached_by_class(classify):
+    # type: (Callable[[Any], int]) -> Callable[[Any], int]
+    """Decorate a function of a class so it is only called once for each
+    class, as issubclass is slow for typing metaclasses"""
+    cache = {}  # type: Dict[Any, int]
+
+    def cached(cls):
+        # type: (Any) -> int
+        try:
+            return cache[cls]
+        except KeyError:
+            # If another thread got there first then use its result
+            return cache.setdefault(cls, classify(cls))
+
+    return cached
+
+
 def json_encode(o, indent=None):
     s = json.dumps(o, default=serialize_object, indent=indent)
     return s
 
 
-def json_decode(s, dict_cls=FrozenOrderedDict):
+def json_encode_iter(o, indent=None, chunk_size=65536):
+    """Encode o as JSON, yielding it in chunks of about chunk_size characters
+
+    This gives the same JSON as json_encode(o, indent), but serializes each
+    Serializable, dict and Array as it is written rather than serializing the
+    whole tree up front, so the memory used stays near the size of a chunk
+
+    Args:
+        o: The object to encode
+        indent: If given, pretty print with this many spaces of indent
+        chunk_size: The approximate length of the strings to yield
+    """
+    if indent is not None:
+        indent = " " * indent
+    # Encode numpy and primitive arrays this many elements at a time
+    array_chunk = max(1, chunk_size // 16)
+    parts = []  # type: List[str]
+    length = 0
+    for part in _iterencode(o, indent, 0, array_chunk):
+        parts.append(part)
+        length += len(part)
+        if length >= chunk_size:
+            yield "".join(parts)
+            parts = []
+            length = 0
+    if parts:
+        yield "".join(parts)
+
+
+def json_dump(o, fp, indent=None, chunk_size=65536):
+    """Encode o as JSON and write it to a file-like object in chunks
+
+    Args:
+        o: The object to encode
+        fp: The object with a write() method to write each chunk to
+        indent: If given, pretty print with this many spaces of indent
+        chunk_size: The approximate length of the strings to write
+    """
+    for chunk in json_encode_iter(o, indent, chunk_size):
+        fp.write(chunk)
+
+
+def _iterencode(o, indent, level, array_chunk):
+    cls = o.__class__
+    try:
+        serializer = _serializer_cache[cls]
+    except KeyError:
+        serializer = _find_serializer(cls)
+    if serializer is None:
+        if isinstance(o, tuple):
+            items = o  # type: Any
+        else:
+            # A primitive
+            yield _json_encoder.encode(o)
+            return
+    elif serializer is _serialize_to_dict and isinstance(o, Serializable) \
+            and cls.to_dict == Serializable.to_dict:
+        # Walk the fields, in the same order as to_dict would make them
+        pairs = [(k, getattr(o, k)) for k in o.call_types]
+        if o.typeid:
+            pairs.insert(0, ("typeid", o.typeid))
+        for s in _iterencode_pairs(pairs, indent, level, array_chunk):
+            yield s
+        return
+    elif serializer is _serialize_dict:
+        for s in _iterencode_pairs(o.items(), indent, level, array_chunk):
+            yield s
+        return
+    elif serializer is _serialize_list:
+        items = o
+    elif serializer is _serialize_array and isinstance(o.seq, list) and \
+            _list_recurses(o.typ):
+        # A list of objects that need serializing
+        items = o.seq
+    elif serializer is _serialize_array or (
+            serializer is _serialize_tolist and getattr(o, "ndim", 0)):
+        # An Array or numpy array of things that serialize in bulk
+        if serializer is _serialize_array:
+            o = o.seq
+        if indent is None:
+            for s in _iterencode_chunks(o, array_chunk):
+                yield s
+            return
+        items = _iterchunks(o, array_chunk)
+    else:
+        # Use the serialized version, which may be a container
+        o = serializer(o, FrozenOrderedDict)
+        for s in _iterencode(o, indent, level, array_chunk):
+            yield s
+        return
+    # If we get here we have some items to make a list from
+    start, sep, end = _separators(indent, level)
+    first = True
+    for item in items:
+        if first:
+            yield "[" + start
+            first = False
+        else:
+            yield sep
+        for s in _iterencode(item, indent, level + 1, array_chunk):
+            yield s
+    if first:
+        yield "[]"
+    else:
+        yield end + "]"
+
+
+def _iterencode_pairs(pairs, indent, level, array_chunk):
+    start, sep, end = _separators(indent, level)
+    first = True
+    for k, v in pairs:
+        if first:
+            yield "{" + start
+            first = False
+        else:
+            yield sep
+        if not isinstance(k, str_):
+            if not isinstance(k, primitive_types):
+                raise TypeError("keys must be str, int, float, bool or None, "
+                                "not %s" % type(k).__name__)
+            # json turns primitive keys into strings
+            k = _json_encoder.encode(k)
+        yield _json_encoder.encode(k) + ": "
+        for s in _iterencode(v, indent, level + 1, array_chunk):
+            yield s
+    if first:
+        yield "{}"
+    else:
+        yield end + "}"
+
+
+def _separators(indent, level):
+    # type: (Optional[str], int) -> Tuple[str, str, str]
+    if indent is None:
+        return "", ", ", ""
+    else:
+        inner = "\n" + indent * (level + 1)
+        sep = _json_indent_encoder.item_separator + inner
+        return inner, sep, "\n" + indent * level
+
+
+def _iterchunks(seq, array_chunk):
+    # Yield the Python objects in seq, array_chunk elements at a time
+    for i in range(0, len(seq), array_chunk):
+        chunk = seq[i:i + array_chunk]
+        if hasattr(chunk, "tolist"):
+            chunk = chunk.tolist()
+        for x in chunk:
+            yield x
+
+
+def _iterencode_chunks(seq, array_chunk):
+    # Let json encode array_chunk elements at a time
+    if len(seq) == 0:
+        yield "[]"
+        return
+    for i in range(0, len(seq), array_chunk):
+        chunk = seq[i:i + array_chunk]
+        if hasattr(chunk, "tolist"):
+            chunk = chunk.tolist()
+        s = _json_encoder.encode(list(chunk))
+        if i == 0:
+            yield "[" + s[1:-1]
+        else:
+            yield ", " + s[1:-1]
+    yield "]"
+
+
+def json_decode(s, dict_cls=FrozenOrderedDict, intern=False):
+    """Decode JSON, making every JSON object a dict_cls
+
+    Args:
+        s (str): The JSON to decode
+        dict_cls: The dict class to make JSON objects into
+        intern: If True, dict_cls must be hashable like FrozenOrderedDict,
+            and dicts with the same items in the same order as one decoded
+            before that is still alive will be that object, so identical
+            subtrees in long lived state share memory. The lists in them are
+            shared too, so must not be changed
+    """
+    if intern:
+        assert dict_cls.__hash__ is not None, \
+            "Can't intern %s as it is mutable" % dict_cls.__name__
+
+        def object_pairs_hook(pairs):
+            return intern_pairs(pairs, dict_cls)
+    else:
+        object_pairs_hook = dict_cls
     try:
-        o = json.loads(s, object_pairs_hook=dict_cls)
+        o = json.loads(s, object_pairs_hook=object_pairs_hook)
         assert isinstance(o, dict_cls), "didn't return %s" % dict_cls.__name__
         return o
     except Exception as e:
         raise ValueError("Error decoding JSON object (%s)" % str(e))
 
 
-def serialize_object(o, dict_cls=FrozenOrderedDict):
-    # type: (Any, Type[dict]) -> Any
-    # Is it a Serializable?
-    to_dict = getattr(o, "to_dict", None)
-    if to_dict is not None:
-        return to_dict(dict_cls)
+def intern_pairs(pairs, dict_cls=FrozenOrderedDict):
+    """Return the interned dict_cls with these (key, value) pairs, making it
+    if there isn't one
+
+    Args:
+        pairs: List of (key, value) pairs, where each value is a primitive,
+            an interned dict, or a list of them
+        dict_cls: The immutable dict class to make
+    """
+    # Key each value, and each item in a list, with primitive_key() so 1, 1.0
+    # and True aren't the same. Dicts are already interned, and are kept
+    # alive by the dict we return for as long as it is in _interned, so are
+    # keyed by id
+    items = [dict_cls]  # type: List[Any]
+    for k, v in pairs:
+        cls = v.__class__
+        items.append(k)
+        if cls is dict_cls:
+            items += (cls, id(v))
+        elif cls is list:
+            items += (cls, tuple((dict_cls, id(x)) if x.__class__ is dict_cls
+                                 else primitive_key(x) for x in v))
+        else:
+            items += primitive_key(v)
+    key = tuple(items)
+    try:
+        d = _interned.get(key, None)
+    except TypeError:
+        # Something in it can't be hashed, like a list of lists
+        return dict_cls(pairs)
+    if d is None:
+        d = dict_cls(pairs)
+        _interned[key] = d
+    return d
+
+
+# Weakly held dicts made by intern_pairs() so they are shared while in use
+_interned = weakref.WeakValueDictionary()  # type: MutableMapping[Any, Any]
+
+
+def json_deserialize(s, type_check=None, dict_cls=FrozenOrderedDict):
+    """Decode JSON, making registered Serializables as it goes
+
+    This gives the same as deserialize_object(json_decode(s), type_check),
+    except that every dict with a registered typeid, at any depth, is made
+    into an instance of that class directly from the parsed key value
+    pairs, without making a dict first
+
+    Args:
+        s (str): The JSON to decode
+        type_check: If given, assert the result is an instance of this
+        dict_cls: The dict class to make dicts without a registered typeid
+    """
+    def object_pairs_hook(pairs):
+        if pairs and pairs[0][0] == "typeid":
+            # Serializables always put typeid first
+            subclass = Serializable._subcls_lookup.get(pairs[0][1], None)
+            if subclass is not None:
+                try:
+                    deserializer = subclass.__dict__["_deserializer"]
+                except KeyError:
+                    deserializer = make_deserializer(subclass)
+                return deserializer(pairs, dict_cls)
+        return dict_cls(pairs)
 
-    # Is it a dict?
-    if isinstance(o, dict):
-        # Need to recurse down in case we have a serializable object in the
-        # dict or somewhere further down the tree
-        return dict_cls((k, serialize_object(v, dict_cls))
+    try:
+        o = json.loads(s, object_pairs_hook=object_pairs_hook)
+    except ValueError as e:
+        raise ValueError("Error decoding JSON object (%s)" % str(e))
+    return deserialize_object(o, type_check)
+
+
+def serialize_object(o, dict_cls=FrozenOrderedDict, binary=False):
+    # type: (Any, Type[dict], bool) -> Any
+    """Serialize o into primitives, lists and dict_cls instances
+
+    Args:
+        o: The object to serialize
+        dict_cls: The dict class to make serialized dictionaries with
+        binary: If True then numpy arrays and Arrays wrapping them are not
+            copied to lists, but serialized to a dict_cls holding a
+            memoryview of their data, which deserialize_object() and
+            to_array() can make back into an Array without copying
+    """
+    if binary:
+        return _serialize_binary(o, dict_cls)
+    cls = o.__class__
+    try:
+        serializer = _serializer_cache[cls]
+    except KeyError:
+        serializer = _find_serializer(cls)
+    if serializer is None:
+        # Already serializable
+        return o
+    else:
+        return serializer(o, dict_cls)
+
+
+def _serialize_binary(o, dict_cls):
+    # Like serialize_object, but recurse into the object tree ourselves so we
+    # can pick out the numpy arrays
+    cls = o.__class__
+    try:
+        serializer = _serializer_cache[cls]
+    except KeyError:
+        serializer = _find_serializer(cls)
+    if serializer is _serialize_array and hasattr(o.seq, "dtype"):
+        return _serialize_buffer(o.seq, dict_cls)
+    elif serializer is _serialize_tolist and getattr(o, "ndim", 0):
+        return _serialize_buffer(o, dict_cls)
+    elif serializer is _serialize_to_dict and isinstance(o, Serializable) \
+            and cls.to_dict == Serializable.to_dict:
+        pairs = [(k, _serialize_binary(getattr(o, k), dict_cls))
+                 for k in o.call_types]
+        if o.typeid:
+            pairs.insert(0, ("typeid", o.typeid))
+        return dict_cls(pairs)
+    elif serializer is _serialize_dict:
+        return dict_cls((k, _serialize_binary(v, dict_cls))
                         for k, v in o.items())
+    elif serializer is _serialize_list:
+        return [_serialize_binary(x, dict_cls) for x in o]
+    elif serializer is _serialize_array and isinstance(o.seq, list) and \
+            _list_recurses(o.typ):
+        return [_serialize_binary(x, dict_cls) for x in o.seq]
+    elif serializer is None:
+        return o
+    else:
+        return serializer(o, dict_cls)
+
+
+def _serialize_buffer(seq, dict_cls):
+    if seq.dtype.hasobject or seq.dtype.fields:
+        # Can't share the memory of python objects or structured arrays
+        return seq.tolist()
+    if not seq.flags.c_contiguous:
+        # Only copy if we have to
+        seq = seq.copy(order="C")
+    return dict_cls((
+        ("typeid", ARRAY_BUFFER_TYPEID),
+        ("dtype", seq.dtype.str),
+        ("shape", list(seq.shape)),
+        ("data", memoryview(seq))))
+
+
+def register_serializer(typ, serializer):
+    # type: (Any, Serializer) -> None
+    """Register a function to serialize instances of typ and its subclasses
+
+    Args:
+        typ: The type that should be serialized by serializer
+        serializer: Function that takes (o, dict_cls) and returns a
+            serialized version of o, calling serialize_object(x, dict_cls)
+            on any children that may need serializing
+    """
+    _registered_serializers[typ] = serializer
+    # Cached lookups for subclasses of typ may now be wrong
+    _serializer_cache.clear()
+
+
+def _serialize_to_dict(o, dict_cls):
+    # Serializable, or something else with a to_dict method
+    return o.to_dict(dict_cls)
+
+
+def _serialize_dict(o, dict_cls):
+    # Need to recurse down in case we have a serializable object in the
+    # dict or somewhere further down the tree
+    return dict_cls((k, serialize_object(v, dict_cls)) for k, v in o.items())
+
+
+def _serialize_list(o, dict_cls):
+    # Don't know what would be in a list, so recurse
+    return [serialize_object(x, dict_cls) for x in o]
+
+
+def _serialize_array(o, dict_cls):
+    # Unwrap the array as it might be a list, tuple or numpy array
+    seq = o.seq
+    if not isinstance(seq, list):
+        return serialize_object(seq, dict_cls)
+    # If we wrapped list, the Array typ tells us what might be in it
+    if _list_recurses(o.typ):
+        return _serialize_list(seq, dict_cls)
+    else:
+        return seq
+
 
-    # Is it an Array, list or numpy array?
-    if o.__class__ is Array:
-        # If we wrapped list, this will tell it what might be in it
-        list_cls = o.typ
-        # Unwrap the array as it might be a list, tuple or numpy array
-        o = o.seq
+def _list_recurses(list_cls):
+    # type: (Any) -> bool
+    """Whether a list of list_cls instances needs its items serializing"""
+    return inspect.isclass(list_cls) and (
+        hasattr(list_cls, "to_dict") or
+        isinstance(list_cls, Exception) or (
+            has_enum and isinstance(list_cls, Enum)))
+
+
+def _serialize_tolist(o, dict_cls):
+    # Numpy bools, numbers and arrays all have a tolist function
+    return o.tolist()
+
+
+def _serialize_exception(o, dict_cls):
+    # Exceptions should be stringified
+    return stringify_error(o)
+
+
+def _serialize_enum(o, dict_cls):
+    # Return value of enums
+    return o.value
+
+
+def _find_serializer(cls):
+    # type: (Any) -> Optional[Serializer]
+    """Find the function to serialize instances of cls and cache it, or None
+    if they are serializable already"""
+    for base in inspect.getmro(cls):
+        serializer = _registered_serializers.get(base, None)
+        if serializer is not None:
+            break
     else:
-        # Don't know what would be in a list, so give it something that will
-        # require it to recurse
-        list_cls = Serializable
-    if isinstance(o, list):
-        if inspect.isclass(list_cls) and (
-            hasattr(list_cls, "to_dict") or
-            isinstance(list_cls, Exception) or (
-                has_enum and isinstance(list_cls, Enum))):
-            recurse = True
+        if getattr(cls, "to_dict", None) is not None:
+            serializer = _serialize_to_dict
+        elif issubclass(cls, dict):
+            serializer = _serialize_dict
+        elif issubclass(cls, Array):
+            serializer = _serialize_array
+        elif issubclass(cls, list):
+            serializer = _serialize_list
+        elif hasattr(cls, "tolist"):
+            serializer = _serialize_tolist
+        elif issubclass(cls, Exception):
+            serializer = _serialize_exception
+        elif has_enum and issubclass(cls, Enum):
+            serializer = _serialize_enum
         else:
-            recurse = False
-        if recurse:
-            return [serialize_object(x) for x in o]
-        else:
-            return o
-    elif hasattr(o, "tolist"):
-        # Numpy bools, numbers and arrays all have a tolist function
-        return o.tolist()
-    elif isinstance(o, Exception):
-        # Exceptions should be stringified
-        return stringify_error(o)
-    elif has_enum and isinstance(o, Enum):
-        # Return value of enums
-        return o.value
-    else:
-        # Everything else should be serializable already
-        return o
+            # Everything else should be serializable already
+            serializer = None
+    _serializer_cache[cls] = serializer
+    return serializer
+
+
+# dict mapping type -> serializer function, added to by register_serializer()
+_registered_serializers = {}  # type: Dict[Any, Serializer]
+
+# dict mapping type -> serializer function or None for exactly that type,
+# filled in by _find_serializer() the first time each type is seen
+_serializer_cache = {}  # type: Dict[Any, Optional[Serializer]]
+
+# Used to encode the leaves of the tree for json_encode_iter()
+_json_encoder = json.JSONEncoder(default=serialize_object)
+# Python 2 uses ", " between items when indenting, Python 3 uses ","
+_json_indent_encoder = json.JSONEncoder(indent=1)
 
 
 T = TypeVar("T")
@@ -92,8 +516,11 @@ T = TypeVar("T")
 def deserialize_object(ob, type_check=None):
     # type: (Any, Union[Type[T], Tuple[Type[T], ...]]) -> T
     if isinstance(ob, dict):
-        subclass = Serializable.lookup_subclass(ob)
-        ob = subclass.from_dict(ob)
+        if ob.get("typeid", None) == ARRAY_BUFFER_TYPEID:
+            ob = array_from_buffer(ob)
+        else:
+            subclass = Serializable.lookup_subclass(ob)
+            ob = subclass.from_dict(ob)
     if type_check is not None:
         assert isinstance(ob, type_check), \
             "Expected %s, got %r" % (type_check, type(ob))
@@ -118,7 +545,7 @@ class Serializable(WithCallTypes):
                 return getattr(self, item)
             except (AttributeError, TypeError):
                 raise KeyError(item)
-        elif item is "typeid" and self.typeid is not None:
+        elif item == "typeid" and self.typeid is not None:
             return self.typeid
         else:
             raise KeyError(item)
@@ -126,6 +553,31 @@ class Serializable(WithCallTypes):
     def __iter__(self):
         return iter(self.call_types)
 
+    # No __len__, as numpy would then take a list of Serializables to be a
+    # sequence of sequences rather than of objects
+
+    def __contains__(self, item):
+        return item in self.call_types
+
+    def keys(self):
+        """The names of the attributes, in the order of call_types"""
+        return self.call_types.keys()
+
+    def values(self):
+        """The values of the attributes, in the order of call_types"""
+        return [getattr(self, k) for k in self.call_types]
+
+    def items(self):
+        """(name, value) pairs for the attributes, in the order of
+        call_types"""
+        return [(k, getattr(self, k)) for k in self.call_types]
+
+    def get(self, item, default=None):
+        try:
+            return self[item]
+        except KeyError:
+            return default
+
     def to_dict(self, dict_cls=FrozenOrderedDict):
         # type: (Type[dict]) -> Dict[str, Any]
         """Create a dictionary representation of object attributes
@@ -133,14 +585,11 @@ class Serializable(WithCallTypes):
         Returns:
             OrderedDict serialised version of self
         """
-        if self.typeid:
-            keys = ["typeid"] + list(self.call_types)
-        else:
-            keys = self.call_types
-
-        pairs = ((k, serialize_object(getattr(self, k), dict_cls))
-                 for k in keys)
-        d = dict_cls(pairs)
+        try:
+            serializer = self.__class__.__dict__["_serializer"]
+        except KeyError:
+            serializer = make_serializer(self.__class__)
+        d = serializer(self, dict_cls)
         return d
 
     @classmethod
@@ -154,14 +603,13 @@ class Serializable(WithCallTypes):
         Returns:
             Instance of this class
         """
-        filtered = {}
-        for k, v in d.items():
-            if k == "typeid":
-                assert v == cls.typeid, \
-                    "Dict has typeid %s but %s has typeid %s" % \
-                    (v, cls, cls.typeid)
-            elif k not in ignore:
-                filtered[k] = v
+        filtered = dict(d)
+        typeid = filtered.pop("typeid", cls.typeid)
+        assert typeid == cls.typeid, \
+            "Dict has typeid %s but %s has typeid %s" % \
+            (typeid, cls, cls.typeid)
+        for k in ignore:
+            filtered.pop(k, None)
         try:
             inst = cls(**filtered)
         except TypeError as e:
@@ -178,6 +626,11 @@ class Serializable(WithCallTypes):
         def decorator(subclass):
             cls._subcls_lookup[typeid] = subclass
             subclass.typeid = typeid
+            for name in ("_serializer", "_deserializer"):
+                if name in subclass.__dict__:
+                    # It was made with the old typeid, so make a new one
+                    # when it is next needed
+                    delattr(subclass, name)
             return subclass
         return decorator
 
@@ -204,3 +657,118 @@ class Serializable(WithCallTypes):
             raise TypeError("'%s' not a valid typeid" % typeid)
         else:
             return subclass
+
+
+def make_serializer(cls):
+    # type: (Type[Serializable]) -> Serializer
+    """Generate a to_dict function specialised for cls from its call_types
+
+    The generated function has a line per field, with how that field is
+    serialized decided from its Anno, and is stored as cls._serializer
+
+    Args:
+        cls: The Serializable subclass to generate the function for
+    """
+    namespace = dict(
+        serialize_object=serialize_object,
+        primitive_types=frozenset(primitive_types),
+        typeid=cls.typeid)  # type: Dict[str, Any]
+    lines = ["def to_dict(self, dict_cls):"]
+    if cls.typeid:
+        pairs = ["('typeid', typeid)"]
+    else:
+        pairs = []
+    for i, (k, anno) in enumerate(cls.call_types.items()):
+        v = "v%d" % i
+        if is_identifier(k):
+            lines.append("    %s = self.%s" % (v, k))
+        else:
+            lines.append("    %s = getattr(self, %r)" % (v, k))
+        if anno.is_array and anno.typ in primitive_types:
+            # Array of primitives can pass its list straight through
+            namespace["c%d" % i] = array_cls(anno.typ)
+            lines += [
+                "    if %s.__class__ is c%d and %s.seq.__class__ is list:" % (
+                    v, i, v),
+                "        %s = %s.seq" % (v, v),
+                "    else:",
+                "        %s = serialize_object(%s, dict_cls)" % (v, v)]
+        elif not anno.is_mapping and anno.typ in primitive_types:
+            # Primitives can be passed straight through
+            lines += [
+                "    if %s.__class__ not in primitive_types:" % v,
+                "        %s = serialize_object(%s, dict_cls)" % (v, v)]
+        elif inspect.isclass(anno.typ) and issubclass(anno.typ, Serializable) \
+                and not anno.is_array:
+            # Serializable can call to_dict directly
+            namespace["t%d" % i] = anno.typ
+            lines += [
+                "    if %s.__class__ is t%d:" % (v, i),
+                "        %s = %s.to_dict(dict_cls)" % (v, v),
+                "    else:",
+                "        %s = serialize_object(%s, dict_cls)" % (v, v)]
+        else:
+            # Could be anything, so do the full check
+            lines.append("    %s = serialize_object(%s, dict_cls)" % (v, v))
+        pairs.append("(%r, %s)" % (k, v))
+    lines.append("    return dict_cls([%s])" % ", ".join(pairs))
+    code = compile("\n".join(lines), "<%s serializer>" % cls.__name__, "exec")
+    exec(code, namespace)
+    serializer = namespace["to_dict"]
+    setattr(cls, "_serializer", serializer)
+    return serializer
+
+
+def make_deserializer(cls):
+    # type: (Type[Serializable]) -> Deserializer
+    """Generate a function specialised for cls that makes an instance from
+    the (key, value) pairs of its serialized dict
+
+    If the pairs are in the order that to_dict() writes them the instance is
+    made by calling cls directly, otherwise cls.from_dict() is used. The
+    function is stored as cls._deserializer
+
+    Args:
+        cls: The Serializable subclass to generate the function for
+    """
+    namespace = dict(cls=cls, typeid=cls.typeid)  # type: Dict[str, Any]
+    lines = ["def deserialize(pairs, dict_cls):"]
+    from_dict_owner = [
+        c for c in inspect.getmro(cls) if "from_dict" in c.__dict__][0]
+    if from_dict_owner is Serializable:
+        keys = list(cls.call_types)
+        lines.append("    if len(pairs) == %d:" % (len(keys) + 1))
+        unpack = ["_"]
+        checks = []
+        args = []
+        kwargs = []
+        for i, k in enumerate(keys):
+            unpack.append("(k%d, v%d)" % (i, i))
+            checks.append("k%d == %r" % (i, k))
+            if is_identifier(k):
+                args.append("%s=v%d" % (k, i))
+            else:
+                kwargs.append("%r: v%d" % (k, i))
+        if kwargs:
+            args.append("**{%s}" % ", ".join(kwargs))
+        if keys:
+            lines += [
+                "        %s, = pairs" % ", ".join(unpack),
+                "        if %s:" % " and ".join(checks)]
+            indent = "            "
+        else:
+            indent = "        "
+        lines += [
+            indent + "try:",
+            indent + "    return cls(%s)" % ", ".join(args),
+            indent + "except TypeError as e:",
+            indent + "    raise TypeError("
+                     "'%s raised error: %s' % (typeid, str(e)))"]
+    # Not in the expected order, or from_dict is overridden
+    lines.append("    return cls.from_dict(dict_cls(pairs))")
+    code = compile(
+        "\n".join(lines), "<%s deserializer>" % cls.__name__, "exec")
+    exec(code, namespace)
+    deserializer = namespace["deserialize"]
+    setattr(cls, "_deserializer", deserializer)
+    return deserializer
@@ -0,0 +1,215 @@
+import array
+import itertools
+
+from ._array import array_cls, make_array, to_array, _typecodes
+from ._calltypes import WithCallTypes
+from ._compat import str_
+from ._typing import TYPE_CHECKING
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Dict, Any, List, Callable, Sequence
+
+# dict Table subclass -> names of its Array annotated arguments
+_table_columns = {}  # type: Dict[Any, List[str]]
+
+
+def table_columns(cls):
+    # type: (Any) -> List[str]
+    """Return the names of the columns of a Table subclass"""
+    try:
+        return _table_columns[cls]
+    except KeyError:
+        columns = [k for k, anno in cls.call_types.items() if anno.is_array]
+        return _table_columns.setdefault(cls, columns)
+
+
+def make_buffer(typ, seq):
+    # type: (Any, Any) -> Any
+    """Make a contiguous buffer holding the values of seq as typ
+
+    Numpy element types, and numpy arrays of bools or numbers, are stored as
+    numpy arrays without copying if they already have the right dtype. Other
+    floats and ints are copied into an array.array, and everything else into
+    a list.
+
+    Args:
+        typ: The element type of the column
+        seq: The values, as anything to_array() takes for an Array[typ]
+    """
+    seq = to_array(array_cls(typ), seq).seq
+    if hasattr(typ, "dtype") or (hasattr(seq, "dtype") and (
+            typ in _typecodes or typ is bool)):
+        import numpy as np
+        return np.asarray(seq, dtype=typ)
+    typecode = _typecodes.get(typ, None)
+    if typecode:
+        return array.array(typecode, seq)
+    else:
+        return list(seq)
+
+
+def _take(seq, item):
+    # type: (Any, Any) -> Any
+    """Return the elements of seq selected by a mask or sequence of
+    indexes, in the same type of buffer"""
+    if len(item) == 0:
+        return seq[:0]
+    elif hasattr(seq, "dtype"):
+        import numpy as np
+        return seq[np.asarray(item)]
+    elif hasattr(item, "dtype"):
+        # A numpy mask or index array, turned into bools or ints
+        return _take(seq, item.tolist())
+    elif all(x.__class__ is bool for x in item):
+        if len(item) != len(seq):
+            raise IndexError("Mask has length %d, expected %d" % (
+                len(item), len(seq)))
+        values = itertools.compress(seq, item)  # type: Any
+    else:
+        values = [seq[i] for i in item]
+    if isinstance(seq, array.array):
+        return array.array(seq.typecode, values)
+    else:
+        return list(values)
+
+
+class Table(WithCallTypes):
+    """Base class for a table whose columns are the Array annotated arguments
+    of __init__
+
+    Each column is stored in a contiguous buffer chosen from its element
+    type when it is set, and checked to be the same length as the others, so
+    rows can be got without checking the whole table. For example:
+
+    >>> class Points(Table):
+    ...     def __init__(self, name, x):
+    ...         # type: (AName, AX) -> None
+    ...         self.name = name  # stored as a list
+    ...         self.x = x  # stored as array.array("d")
+    >>> points = Points(["a", "b"], [1, 2])
+    >>> points[1]
+    ['b', 2.0]
+    >>> points[[True, False]]
+    Points(name=Array(['a']), x=Array(array('d', [1.0])))
+    """
+
+    def __setattr__(self, name, value):
+        anno = self.call_types.get(name, None)
+        if anno is not None and anno.is_array:
+            value = make_array(anno.typ, make_buffer(anno.typ, value))
+            others = [k for k in table_columns(self.__class__)
+                      if k != name and k in self.__dict__]
+            if others and len(value) != len(self):
+                raise ValueError("Column %s has length %d, expected %d" % (
+                    name, len(value), len(self)))
+            self.__dict__["_length"] = len(value)
+        object.__setattr__(self, name, value)
+
+    def __len__(self):
+        # type: () -> int
+        return self.__dict__.get("_length", 0)
+
+    def __getitem__(self, item):
+        """Get a row as a list if item is an int, otherwise a new table
+        containing the rows selected by a slice, a mask of bools or a
+        sequence of indexes"""
+        if isinstance(item, str_):
+            # Let a Serializable base class give dict style access
+            return super(Table, self).__getitem__(item)
+        columns = table_columns(self.__class__)
+        if isinstance(item, slice):
+            return self._select(lambda seq: seq[item])
+        elif hasattr(item, "__index__") and not hasattr(item, "__len__"):
+            d = self.__dict__
+            return [d[k].seq[item] for k in columns]
+        else:
+            if not hasattr(item, "dtype"):
+                item = list(item)
+            return self._select(lambda seq: _take(seq, item))
+
+    def _select(self, f):
+        # type: (Callable[[Any], Any]) -> Table
+        # Make a copy of self with f applied to the buffer of each column
+        inst = object.__new__(self.__class__)
+        inst.__dict__.update(self.__dict__)
+        length = 0
+        for k in table_columns(self.__class__):
+            column = self.__dict__[k]
+            seq = f(column.seq)
+            inst.__dict__[k] = make_array(column.typ, seq)
+            length = len(seq)
+        inst.__dict__["_length"] = length
+        return inst
+
+    def append(self, *args, **kwargs):
+        """Add a row to the end of the table
+
+        Args:
+            args: The value of each column, in the order of call_types
+            kwargs: The value of each column by name
+        """
+        row = self._named(args, kwargs)
+        self.extend(**dict((k, [v]) for k, v in row.items()))
+
+    def extend(self, *args, **kwargs):
+        """Add rows to the end of the table
+
+        Each column is copied into a new buffer, so Arrays got from the table
+        beforehand are left as they were. This makes adding rows one at a
+        time slow for large tables, so add them together where possible.
+
+        Args:
+            args: Either a table of the same class to add the rows of, or
+                the values of each column in the order of call_types
+            kwargs: The values of each column by name
+        """
+        if len(args) == 1 and not kwargs and \
+                args[0].__class__ is self.__class__:
+            other = args[0]
+            columns = dict((k, other.__dict__[k].seq)
+                           for k in table_columns(other.__class__))
+        else:
+            columns = self._named(args, kwargs)
+        # Make all the buffers before changing anything, so an error leaves
+        # the table as it was
+        buffers = {}
+        for k, values in columns.items():
+            buffers[k] = make_buffer(self.call_types[k].typ, values)
+        lengths = dict((k, len(v)) for k, v in buffers.items())
+        if len(set(lengths.values())) > 1:
+            raise ValueError("Column lengths %s don't match" % lengths)
+        for k, new in buffers.items():
+            column = self.__dict__[k]
+            seq = column.seq
+            if hasattr(seq, "dtype"):
+                import numpy as np
+                seq = np.concatenate((seq, new))
+            else:
+                # Copy the list or array.array so Arrays already got from
+                # this table don't change
+                seq = seq[:]
+                seq.extend(new)
+            self.__dict__[k] = make_array(column.typ, seq)
+        if lengths:
+            self.__dict__["_length"] = len(self) + lengths.popitem()[1]
+
+    def _named(self, args, kwargs):
+        # type: (Sequence, Dict[str, Any]) -> Dict[str, Any]
+        # Turn positional and keyword column values into a dict with all of
+        # the columns in it
+        columns = table_columns(self.__class__)
+        if len(args) > len(columns):
+            raise TypeError("%s has %d columns, got %d" % (
+                self.__class__.__name__, len(columns), len(args)))
+        named = dict(zip(columns, args))
+        for k, v in kwargs.items():
+            if k not in columns:
+                raise TypeError("%s has no column %r" % (
+                    self.__class__.__name__, k))
+            elif k in named:
+                raise TypeError("Got multiple values for column %r" % k)
+            named[k] = v
+        missing = [k for k in columns if k not in named]
+        if missing:
+            raise TypeError("Missing columns %s" % missing)
+        return named
@@ -0,0 +1,18 @@
+"""Performance benchmarks, not run as part of the tests
+
+Run each from the top of the repo, e.g.::
+
+    python -m benchmarks.bench_serializable
+"""
+import timeit
+
+
+def report(name, f, number=100000, repeat=5):
+    """Time calling f() and print the best time per call
+
+    Returns:
+        The best time per call in seconds
+    """
+    t = min(timeit.repeat(f, number=number, repeat=repeat)) / number
+    print("%-50s %10.3f us" % (name, t * 1e6))
+    return t
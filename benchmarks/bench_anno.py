@@ -0,0 +1,76 @@
+"""Benchmarks for running a module that defines 500 Annos with the Anno
+context manager, against the one that compared the names in the module, and
+for anno_with_default() against copying the Anno each time"""
+import copy
+import sys
+
+from annotypes import Anno
+from annotypes._anno import anno_with_default
+
+from benchmarks import report
+
+ANNOS = 500
+
+
+def old_caller_locals():
+    # caller_locals() before it used sys._getframe
+    try:
+        raise ValueError
+    except ValueError:
+        _, _, tb = sys.exc_info()
+        return tb.tb_frame.f_back.f_back.f_locals
+
+
+class OldAnno(Anno):
+    # The context manager before it used dict ordering
+    def __enter__(self):
+        self._names_on_enter = set(old_caller_locals())
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        locals_d = old_caller_locals()
+        defined = set(locals_d) - self._names_on_enter
+        assert len(defined) == 1
+        self.name = defined.pop()
+        self._get_type(locals_d[self.name])
+        locals_d[self.name] = self
+
+
+def make_module(anno_cls):
+    lines = ["from annotypes import Array"]
+    for i in range(ANNOS):
+        lines += ["with %s('Argument %d'):" % (anno_cls.__name__, i),
+                  "    AArg%d = Array[float]" % i]
+    return compile("\n".join(lines), "<%d Annos>" % ANNOS, "exec")
+
+
+def main():
+    t = {}
+    for anno_cls in (OldAnno, Anno):
+        code = make_module(anno_cls)
+
+        def run():
+            namespace = {anno_cls.__name__: anno_cls}
+            exec(code, namespace)
+            return namespace
+
+        assert run()["AArg%d" % (ANNOS - 1)].name == "AArg%d" % (ANNOS - 1)
+        t[anno_cls] = report("Module with %d %ss" % (ANNOS, anno_cls.__name__),
+                             run, number=20)
+    print("Speedup: %.1fx" % (t[OldAnno] / t[Anno]))
+
+    def old_with_default(src, default):
+        # What anno_with_default() did before sharing copies
+        anno = copy.copy(src)
+        anno.default = default
+        return anno
+
+    anno = Anno("The tags").set_typ(str, is_array=True)
+    t_old = report("Copy Anno with default", lambda: old_with_default(
+        anno, ("tag",)))
+    t_new = report("anno_with_default", lambda: anno_with_default(
+        anno, ("tag",)))
+    print("Speedup: %.1fx" % (t_old / t_new))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Benchmarks for make_annotations on the functions in py2_examples"""
+import importlib
+import inspect
+import tokenize
+
+from annotypes import make_annotations, set_type_comment_cache
+from annotypes._calltypes import type_re, _expressions
+from annotypes._compat import getargspec
+
+from benchmarks import report
+
+MODULES = ["composition", "enumtaker", "manyargs", "mapping", "reusecls",
+           "simple", "table"]
+
+
+def tokenize_eval_annotations(f, globals_d):
+    # The make_annotations implementation before it used ast, tokenizing the
+    # whole function and eval-ing each type comment
+    lines, _ = inspect.getsourcelines(f)
+    args = getargspec(f).args
+    it = iter(lines)
+    types = []
+    for token in tokenize.generate_tokens(lambda: next(it)):
+        typ, string = token[:2]
+        if typ == tokenize.COMMENT:
+            found = type_re.match(string)
+            if found:
+                parts = found.groups()
+                if parts[0] != "(...)":
+                    ob = eval(parts[0].replace("*", ""), globals_d)
+                    if isinstance(ob, tuple):
+                        types += list(ob)
+                    else:
+                        types.append(ob)
+                if parts[1]:
+                    ob = eval(parts[2], globals_d)
+                    if args and args[0] in ["self", "cls"]:
+                        if len(args) == len(types) + 1:
+                            args = args[1:]
+                    ret = dict(zip(args, types))
+                    ret["return"] = ob
+                    return ret
+    return {}
+
+
+def find_functions(module):
+    # Every function in module with a type comment
+    functions = []
+    for name, ob in sorted(vars(module).items()):
+        if inspect.isclass(ob) and ob.__module__ == module.__name__:
+            functions += [f for _, f in sorted(vars(ob).items())
+                          if inspect.isfunction(f)]
+        elif inspect.isfunction(ob) and ob.__module__ == module.__name__:
+            functions.append(ob)
+    return [f for f in functions if "# type:" in inspect.getsource(f)]
+
+
+def main():
+    # Time parsing, not reading the on disk cache
+    set_type_comment_cache(False)
+    functions = []
+    for name in MODULES:
+        module = importlib.import_module("annotypes.py2_examples." + name)
+        functions += [(f, vars(module)) for f in find_functions(module)]
+    for f, globals_d in functions:
+        assert make_annotations(f, globals_d) == \
+            tokenize_eval_annotations(f, globals_d), f
+
+    def old():
+        for f, globals_d in functions:
+            tokenize_eval_annotations(f, globals_d)
+
+    def new():
+        for f, globals_d in functions:
+            make_annotations(f, globals_d)
+
+    def new_uncached():
+        _expressions.clear()
+        new()
+
+    name = "%d py2_examples functions" % len(functions)
+    t_old = report(name + " tokenize+eval", old, number=100)
+    t_new = report(name + " ast", new, number=100)
+    report(name + " ast, parsing every time", new_uncached, number=100)
+    print("Speedup: %.1fx" % (t_old / t_new))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Benchmarks for comparing Arrays with different backings, against the
+native != that seq_neq used before, and for hashing frozen Arrays"""
+import array
+import warnings
+
+import numpy as np
+
+from annotypes import make_array
+
+from benchmarks import report
+
+N = 100000
+
+
+def old_seq_neq(seq, other):
+    # seq_neq before it compared lengths and buffers
+    not_equal = seq != other
+    if hasattr(not_equal, "any"):
+        not_equal = not_equal.any()
+    return not_equal
+
+
+def main():
+    floats = [i * 0.5 for i in range(N)]
+    backings = dict(
+        list=floats,
+        array=array.array("d", floats),
+        numpy=np.array(floats))
+    for a, b in (("array", "array"), ("numpy", "array"), ("numpy", "list")):
+        x = make_array(float, backings[a])
+        # A copy, so they aren't the same object
+        y = make_array(float, backings[b][:])
+        t_old = report("old %s == %s" % (a, b),
+                       lambda: old_seq_neq(x.seq, y.seq), number=10)
+        t_new = report("Array[%s] == Array[%s]" % (a, b),
+                       lambda: x == y, number=10)
+        print("Speedup: %.1fx" % (t_old / t_new))
+    x = make_array(float, backings["numpy"])
+    shorter = floats[:-1]
+    with warnings.catch_warnings():
+        # numpy warns that elementwise comparison failed
+        warnings.simplefilter("ignore")
+        t_old = report("old numpy == shorter list",
+                       lambda: old_seq_neq(x.seq, shorter), number=10)
+    t_new = report("Array[numpy] == shorter list", lambda: x == shorter,
+                   number=10)
+    print("Speedup: %.1fx" % (t_old / t_new))
+    frozen = make_array(float, floats).frozen()
+    report("hash(frozen Array)", lambda: hash(frozen))
+
+
+if __name__ == "__main__":
+    main()
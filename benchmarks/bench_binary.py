@@ -0,0 +1,48 @@
+"""Benchmarks comparing binary_encode with json_encode on a LayoutTable"""
+import numpy as np
+
+from annotypes import Array, Serializable, json_encode, json_decode, \
+    deserialize_object, binary_encode, binary_decode
+from annotypes.py2_examples.table import LayoutTable
+
+from benchmarks import report
+
+
+@Serializable.register_subclass("bench:LayoutTable:1.0")
+class SerializableLayoutTable(LayoutTable, Serializable):
+    pass
+
+
+def make_table(rows, numpy):
+    if numpy:
+        x = Array[float](np.linspace(0, 1000, rows))
+        y = Array[float](np.linspace(0, 500, rows))
+    else:
+        x = Array[float]([i * 1.5 for i in range(rows)])
+        y = Array[float]([i * 0.5 for i in range(rows)])
+    return SerializableLayoutTable(
+        Array[str](["PART%d" % i for i in range(rows)]),
+        Array[str](["BL45P-ML-PART-%02d" % i for i in range(rows)]),
+        x, y, Array[bool]([i % 2 == 0 for i in range(rows)]))
+
+
+def main():
+    for rows, numpy, number in ((10, False, 10000), (10000, False, 10),
+                                (10000, True, 10)):
+        table = make_table(rows, numpy)
+        name = "%d rows%s" % (rows, " numpy" if numpy else "")
+        j = json_encode(table)
+        b = binary_encode(table)
+        print("%s: json %d bytes, binary %d bytes" % (name, len(j), len(b)))
+        report(name + " json_encode", lambda: json_encode(table),
+               number=number)
+        report(name + " binary_encode", lambda: binary_encode(table),
+               number=number)
+        report(name + " json_decode",
+               lambda: deserialize_object(json_decode(j)), number=number)
+        report(name + " binary_decode", lambda: binary_decode(b),
+               number=number)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Benchmarks for importing modules of WithCallTypes classes"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from annotypes import evaluate_call_types, make_annotations, \
+    set_type_comment_cache, save_type_comment_caches
+
+CLASSES = 300
+
+HEADER = """\
+from annotypes import Anno, Array, WithCallTypes
+
+with Anno("The name"):
+    AName = str
+with Anno("The value"):
+    AValue = float
+with Anno("The tags"):
+    ATags = Array[str]
+
+
+class Base(WithCallTypes):
+    pass
+"""
+
+CLASS = """
+
+class Class%d(Base):
+    def __init__(self, name, value, tags=()):
+        # type: (AName, AValue, ATags) -> None
+        self.name = name
+        self.value = value
+        self.tags = tags
+"""
+
+
+def import_module(path, name, evaluate):
+    # Write a new module each time so nothing is cached
+    with open(os.path.join(path, name + ".py"), "w") as f:
+        f.write(HEADER + "".join(CLASS % i for i in range(CLASSES)))
+    start = time.time()
+    module = __import__(name)
+    if evaluate:
+        evaluate_call_types(module.Base)
+    return time.time() - start
+
+
+def annotate_all(module):
+    start = time.time()
+    for i in range(CLASSES):
+        f = getattr(module, "Class%d" % i).__init__
+        make_annotations(f, vars(module))
+    return time.time() - start
+
+
+def report_annotate(name, module, enabled, warm):
+    if warm:
+        save_type_comment_caches()
+    ts = []
+    for _ in range(5):
+        # Clear the in memory caches, reading from disk again if warm
+        set_type_comment_cache(enabled)
+        ts.append(annotate_all(module))
+    print("%-50s %10.3f ms" % (name, min(ts) * 1e3))
+
+
+def main():
+    path = tempfile.mkdtemp()
+    sys.path.insert(0, path)
+    try:
+        for evaluate in (False, True):
+            t = min(import_module(path, "bench_module_%s_%d" % (evaluate, i),
+                                  evaluate) for i in range(5))
+            print("%-50s %10.3f ms" % (
+                "Import %d classes, evaluate=%s" % (CLASSES, evaluate),
+                t * 1e3))
+        # Time make_annotations on every class with and without the cache
+        sys.dont_write_bytecode = False
+        module = sys.modules["bench_module_True_0"]
+        report_annotate("make_annotations, no cache", module, False, False)
+        report_annotate("make_annotations, empty cache", module, True, False)
+        report_annotate("make_annotations, cache on disk", module, True, True)
+    finally:
+        sys.path.remove(path)
+        shutil.rmtree(path)
+
+
+if __name__ == "__main__":
+    main()
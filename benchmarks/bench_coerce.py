@@ -0,0 +1,63 @@
+"""Benchmarks for constructing ManyArgs with and without coerce_call_types,
+one at a time and from columns"""
+from annotypes import coerce_call_types, Union, Sequence
+from annotypes.py2_examples.manyargs import ManyArgs, Axes, Start, Stop, \
+    Size, Units, Alternate, def_units
+
+from benchmarks import report
+
+
+@coerce_call_types
+class CoercedManyArgs(ManyArgs):
+    def __init__(self,
+                 axes,  # type: Union[Axes, Sequence[str], str]
+                 start,  # type: Union[Start, Sequence[float], float]
+                 stop,  # type: Union[Stop, Sequence[float], float]
+                 size,  # type: Size
+                 units=def_units,  # type: Union[Units, Sequence[str], str]
+                 alternate=False  # type: Alternate
+                 ):
+        # type: (...) -> None
+        # The arguments are already coerced, so just check and store them
+        self.axes = axes
+        self.start = start
+        self.stop = stop
+        self.size = size
+        self.units = units
+        self.alternate = alternate
+        assert len(self.axes) == len(self.units) == \
+            len(self.start) == len(self.stop), \
+            "axes %s, units %s, start %s, stop %s are not the same length" % (
+                self.axes, self.units, self.start, self.stop)
+
+
+def main():
+    for args in (("x", 0., 1., 5),
+                 (["x", "y"], [0., 2.], [1., 3.], 5, ["mm", "deg"])):
+        # Same arguments after the class name
+        assert repr(ManyArgs(*args)).split("(", 1)[1] == \
+            repr(CoercedManyArgs(*args)).split("(", 1)[1]
+        old = report("ManyArgs%r" % (args,), lambda: ManyArgs(*args))
+        new = report("CoercedManyArgs%r" % (args,),
+                     lambda: CoercedManyArgs(*args))
+        print("Speedup: %.1fx" % (old / new))
+    # 1000 single axis scans, as columns and as records
+    n = 1000
+    columns = dict(axes=["x"] * n, start=[float(i) for i in range(n)],
+                   stop=[float(i + 1) for i in range(n)], size=[5] * n)
+    records = list(zip(*[columns[k] for k in ("axes", "start", "stop",
+                                              "size")]))
+    name = "%d ManyArgs" % n
+    old = report(name + " one at a time",
+                 lambda: [ManyArgs(*r) for r in records], number=10)
+    report(name + " from_records", lambda: ManyArgs.from_records(records),
+           number=10)
+    report(name + " from_columns", lambda: ManyArgs.from_columns(**columns),
+           number=10)
+    new = report("%d CoercedManyArgs from_columns" % n,
+                 lambda: CoercedManyArgs.from_columns(**columns), number=10)
+    print("Speedup: %.1fx" % (old / new))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Benchmarks for sending a large, mostly static tree with and without
+TrackedSerializable.changes()"""
+from collections import OrderedDict
+
+from annotypes import Anno, Array, Mapping, Any, Serializable, \
+    TrackedSerializable, json_encode, apply_changes, FrozenOrderedDict
+
+from benchmarks import report
+
+with Anno("The value"):
+    AValue = float
+with Anno("The description"):
+    ADescription = str
+with Anno("The tags"):
+    ATags = Array[str]
+with Anno("The fields"):
+    AFields = Mapping[str, Any]
+
+FIELDS = 100
+
+
+@Serializable.register_subclass("bench:TrackedField:1.0")
+class TrackedField(TrackedSerializable):
+    def __init__(self, value, description, tags):
+        # type: (AValue, ADescription, ATags) -> None
+        self.value = value
+        self.description = description
+        self.tags = ATags(tags)
+
+
+@Serializable.register_subclass("bench:TrackedBlock:1.0")
+class TrackedBlock(TrackedSerializable):
+    def __init__(self, fields):
+        # type: (AFields) -> None
+        self.fields = fields
+
+
+def main():
+    block = TrackedBlock(OrderedDict(
+        ("field%d" % i, TrackedField(float(i), "Field %d" % i, ["a", "b"]))
+        for i in range(FIELDS)))
+    remote = apply_changes(FrozenOrderedDict(), block.changes())
+    field = block.fields["field50"]
+
+    def whole():
+        field.value += 1
+        return json_encode(block)
+
+    def delta():
+        field.value += 1
+        return json_encode(block.changes())
+
+    name = "Change 1 of %d fields, " % FIELDS
+    t_whole = report(name + "json_encode(block)", whole, number=1000)
+    t_delta = report(name + "json_encode(block.changes())", delta,
+                     number=1000)
+    print("Speedup: %.1fx, %d bytes instead of %d" % (
+        t_whole / t_delta, len(delta()), len(whole())))
+    changes = block.changes()
+    report("apply_changes() to a FrozenOrderedDict",
+           lambda: apply_changes(remote, changes), number=10000)
+
+
+if __name__ == "__main__":
+    main()
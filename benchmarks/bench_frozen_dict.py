@@ -0,0 +1,74 @@
+"""Benchmarks for FrozenOrderedDict against the implementation that keeps a
+list of its keys"""
+import json
+
+from annotypes import FrozenOrderedDict
+from annotypes._frozen_dict import not_supported
+
+from benchmarks import report
+
+
+class KeysFrozenOrderedDict(dict):
+    # The FrozenOrderedDict implementation before it used dict ordering
+    def __init__(self, seq=()):
+        super(KeysFrozenOrderedDict, self).__init__()
+        keys = []
+        setitem = super(KeysFrozenOrderedDict, self).__setitem__
+        append = keys.append
+        for k, v in seq:
+            setitem(k, v)
+            append(k)
+        self._keys = keys
+
+    __setitem__ = not_supported
+    __delitem__ = not_supported
+
+    def __iter__(self):
+        return (k for k in self._keys)
+
+    def items(self):
+        return [(k, self[k]) for k in self._keys]
+
+    def keys(self):
+        return self._keys
+
+    def values(self):
+        return [self[k] for k in self._keys]
+
+
+def main():
+    pairs = [("typeid", "bench:Update:1.0")] + [
+        ("field%d" % i, float(i)) for i in range(20)]
+    old = KeysFrozenOrderedDict(pairs)
+    new = FrozenOrderedDict(pairs)
+    old2 = KeysFrozenOrderedDict(pairs)
+    new2 = FrozenOrderedDict(pairs)
+    assert list(old.items()) == list(new.items())
+
+    def iterate(d):
+        return lambda: [k for k in d]
+
+    def items(d):
+        return lambda: [v for _, v in d.items()]
+
+    def values(d):
+        return lambda: [v for v in d.values()]
+
+    for name, old_f, new_f in (
+            ("Construct", lambda: KeysFrozenOrderedDict(pairs),
+             lambda: FrozenOrderedDict(pairs)),
+            ("Iterate", iterate(old), iterate(new)),
+            ("Items", items(old), items(new)),
+            ("Values", values(old), values(new)),
+            ("Equality", lambda: old == old2, lambda: new == new2),
+            ("json.dumps", lambda: json.dumps(old), lambda: json.dumps(new))):
+        t_old = report("%s, %d items, keys list" % (name, len(pairs)), old_f)
+        t_new = report("%s, %d items, FrozenOrderedDict" % (name, len(pairs)),
+                       new_f)
+        print("Speedup: %.1fx" % (t_old / t_new))
+    # The hash is cached, so this is only a lookup after the first time
+    report("Use as a dict key", lambda: {new: 1}[new2])
+
+
+if __name__ == "__main__":
+    main()
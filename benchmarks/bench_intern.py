@@ -0,0 +1,51 @@
+"""Benchmarks for json_decode with and without interning, on messages that
+repeat the same small structures"""
+import json
+import sys
+
+from annotypes import json_decode
+
+from benchmarks import report
+
+MESSAGES = 1000
+
+
+def make_message(i):
+    # Each attribute has a value that changes and meta and alarm that don't
+    return json.dumps(dict(("attr%d" % j, dict(
+        value=i + j,
+        alarm=dict(severity=0, status=0, message=""),
+        meta=dict(description="Attribute %d" % j, tags=["widget:textupdate"],
+                  writeable=False, label="Attr %d" % j))) for j in range(10)))
+
+
+def retained_memory(f):
+    """Return the memory still allocated after running f() in MB"""
+    import tracemalloc
+    tracemalloc.start()
+    kept = f()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return current / 1e6
+
+
+def main():
+    messages = [make_message(i) for i in range(MESSAGES)]
+    assert json_decode(messages[0], intern=True) == json_decode(messages[0])
+
+    def decode(intern):
+        return lambda: [json_decode(s, intern=intern) for s in messages]
+
+    name = "json_decode %d messages" % MESSAGES
+    t_old = report(name, decode(False), number=1)
+    t_new = report(name + ", intern=True", decode(True), number=1)
+    print("Slowdown: %.1fx" % (t_new / t_old))
+    if sys.version_info >= (3, 4):
+        for intern in (False, True):
+            print("%s, intern=%s kept memory: %.1f MB" % (
+                name, intern, retained_memory(decode(intern))))
+
+
+if __name__ == "__main__":
+    main()
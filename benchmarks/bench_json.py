@@ -0,0 +1,69 @@
+"""Benchmarks for JSON encoding of large Serializable trees"""
+import sys
+
+import numpy as np
+
+from annotypes import Anno, Array, Union, Sequence, Serializable, \
+    json_encode, json_dump
+
+from benchmarks import report
+
+with Anno("The name of the column"):
+    AName = str
+with Anno("The column data"):
+    AData = Array[float]
+UData = Union[AData, Sequence[float]]
+
+
+@Serializable.register_subclass("bench:Column:1.0")
+class Column(Serializable):
+    def __init__(self, name, data):
+        # type: (AName, UData) -> None
+        self.name = name
+        self.data = AData(data)
+
+
+with Anno("The columns of the table"):
+    AColumns = Array[Column]
+UColumns = Union[AColumns, Sequence[Column]]
+
+
+@Serializable.register_subclass("bench:Table:1.0")
+class Table(Serializable):
+    def __init__(self, columns):
+        # type: (UColumns) -> None
+        self.columns = AColumns(columns)
+
+
+class NullWriter(object):
+    def write(self, s):
+        pass
+
+
+def peak_memory(f):
+    """Return the peak memory allocated while running f() in MB"""
+    import tracemalloc
+    tracemalloc.start()
+    f()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1e6
+
+
+def main():
+    points = np.linspace(0, 1, 1000000)
+    table = Table([
+        Column("x", points), Column("y", points * 2),
+        Column("z", list(points[:100000]))])
+    report("json_encode", lambda: json_encode(table), number=1, repeat=3)
+    report("json_dump", lambda: json_dump(table, NullWriter()),
+           number=1, repeat=3)
+    if sys.version_info >= (3, 4):
+        print("json_encode peak memory: %.1f MB" % peak_memory(
+            lambda: json_encode(table)))
+        print("json_dump peak memory: %.1f MB" % peak_memory(
+            lambda: json_dump(table, NullWriter())))
+
+
+if __name__ == "__main__":
+    main()
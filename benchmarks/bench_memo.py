@@ -0,0 +1,78 @@
+"""Benchmarks for serializing a large tree after changing one object, with
+and without MemoizedSerializable"""
+from collections import OrderedDict
+
+from annotypes import Anno, Array, Mapping, Any, Serializable, \
+    MemoizedSerializable
+
+from benchmarks import report
+
+with Anno("The value"):
+    AValue = float
+with Anno("The description"):
+    ADescription = str
+with Anno("The tags"):
+    ATags = Array[str]
+with Anno("The fields"):
+    AFields = Mapping[str, Any]
+
+FIELDS = 100
+
+
+def make_classes(base):
+    class Field(base):
+        def __init__(self, value, description, tags):
+            # type: (AValue, ADescription, ATags) -> None
+            self.value = value
+            self.description = description
+            self.tags = ATags(tags)
+
+    class Block(base):
+        def __init__(self, fields):
+            # type: (AFields) -> None
+            self.fields = fields
+
+    Serializable.register_subclass("bench:Field:1.0")(Field)
+    Serializable.register_subclass("bench:Block:1.0")(Block)
+    return Field, Block
+
+
+def time_to_dict(name, base):
+    Field, Block = make_classes(base)
+    block = Block(OrderedDict(
+        ("field%d" % i, Field(float(i), "Field %d" % i, ["a", "b"]))
+        for i in range(FIELDS)))
+    field = block.fields["field50"]
+
+    def change_and_serialize():
+        field.value += 1
+        return block.to_dict()
+
+    d = change_and_serialize()
+    assert d["fields"]["field50"]["value"] == field.value
+    return report("Change 1 of %d fields, %s.to_dict()" % (FIELDS, name),
+                  change_and_serialize, number=1000)
+
+
+def time_large_array():
+    Field, _ = make_classes(MemoizedSerializable)
+    field = Field(0., "Large", [])
+    tags = ATags(["tag"] * 1000000)
+
+    def change_and_serialize():
+        field.tags = tags
+        return field.to_dict()
+
+    return report("MemoizedSerializable.to_dict() with 1e6 tags",
+                  change_and_serialize, number=10)
+
+
+def main():
+    t_old = time_to_dict("Serializable", Serializable)
+    t_new = time_to_dict("MemoizedSerializable", MemoizedSerializable)
+    print("Speedup: %.1fx" % (t_old / t_new))
+    time_large_array()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Benchmarks for the memory used by Arrays of floats with and without
+packing lists into an array.array, and the cost of using them"""
+import sys
+
+from annotypes import Array, to_array, json_encode, set_array_packing
+
+from benchmarks import report
+
+N = 100000
+
+
+def retained_memory(f):
+    """Return the memory still allocated after running f() in MB"""
+    import tracemalloc
+    tracemalloc.start()
+    kept = f()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return current / 1e6
+
+
+def main():
+    for pack in (False, True):
+        set_array_packing(pack)
+        name = "packed" if pack else "list"
+        a = to_array(Array[float], [i * 0.5 for i in range(N)])
+        report("to_array(%d floats), %s" % (N, name),
+               lambda: to_array(Array[float], [0.5] * N), number=10)
+        report("Array[float][i], %s" % name, lambda: a[N // 2])
+        report("json_encode(%d floats), %s" % (N, name),
+               lambda: json_encode(a), number=10)
+        if sys.version_info >= (3, 4):
+            print("%-50s %10.1f MB" % (
+                "to_array(%d floats), %s, kept memory" % (N, name),
+                retained_memory(lambda: to_array(
+                    Array[float], [i * 0.5 for i in range(N)]))))
+    set_array_packing(False)
+
+
+if __name__ == "__main__":
+    main()
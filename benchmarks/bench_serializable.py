@@ -0,0 +1,118 @@
+"""Benchmarks for Serializable serialization"""
+from annotypes import Anno, Array, Union, Sequence, Serializable, \
+    serialize_object, FrozenOrderedDict, json_encode, json_decode, \
+    json_deserialize, deserialize_object
+
+from benchmarks import report
+
+with Anno("The severity"):
+    ASeverity = int
+with Anno("The message"):
+    AMessage = str
+with Anno("The value"):
+    AValue = float
+with Anno("The description"):
+    ADescription = str
+with Anno("The tags"):
+    ATags = Array[str]
+UTags = Union[ATags, Sequence[str], str]
+with Anno("The positions"):
+    APositions = Array[float]
+UPositions = Union[APositions, Sequence[float]]
+
+
+@Serializable.register_subclass("bench:Alarm:1.0")
+class Alarm(Serializable):
+    def __init__(self, severity=0, message=""):
+        # type: (ASeverity, AMessage) -> None
+        self.severity = severity
+        self.message = message
+
+
+with Anno("The alarm"):
+    AAlarm = Alarm
+
+
+@Serializable.register_subclass("bench:Update:1.0")
+class Update(Serializable):
+    def __init__(self, value, description, tags, positions, alarm):
+        # type: (AValue, ADescription, UTags, UPositions, AAlarm) -> None
+        self.value = value
+        self.description = description
+        self.tags = ATags(tags)
+        self.positions = APositions(positions)
+        self.alarm = alarm
+
+
+def generic_to_dict(self, dict_cls=FrozenOrderedDict):
+    # The Serializable.to_dict implementation before it was generated per class
+    if self.typeid:
+        keys = ["typeid"] + list(self.call_types)
+    else:
+        keys = self.call_types
+    pairs = ((k, generic_serialize(getattr(self, k), dict_cls))
+             for k in keys)
+    return dict_cls(pairs)
+
+
+def generic_serialize(o, dict_cls=FrozenOrderedDict):
+    if isinstance(o, Serializable):
+        return generic_to_dict(o, dict_cls)
+    return serialize_object(o, dict_cls)
+
+
+def old_getitem(self, item):
+    # The Serializable.__getitem__ implementation before it compared "typeid"
+    # with == rather than is
+    if item in self.call_types:
+        try:
+            return getattr(self, item)
+        except (AttributeError, TypeError):
+            raise KeyError(item)
+    elif item is "typeid" and self.typeid is not None:
+        return self.typeid
+    else:
+        raise KeyError(item)
+
+
+def access(update, getitem):
+    # Read every attribute by name, as code treating it as a dict would
+    keys = list(update.call_types) + ["typeid"]
+
+    def f():
+        for k in keys:
+            getitem(update, k)
+    return f
+
+
+def main():
+    update = Update(
+        3.2, "A block update", ["widget:textinput", "config:1"],
+        [0.5, 1.5, 2.5, 3.5], Alarm(1, "Not connected"))
+    assert generic_to_dict(update) == update.to_dict()
+    old = report("Update generic to_dict", lambda: generic_to_dict(update))
+    new = report("Update generated to_dict", lambda: update.to_dict())
+    print("Speedup: %.1fx" % (old / new))
+    d = update.to_dict()
+    report("Update from_dict", lambda: Update.from_dict(d))
+    j = json_encode([update] * 100)
+    report("100 Updates json_decode + deserialize_object",
+           lambda: [deserialize_object(x) for x in json_decode(
+               '{"l": %s}' % j)["l"]], number=1000)
+    report("100 Updates json_deserialize", lambda: json_deserialize(j),
+           number=1000)
+    old = report("Update[k] for each key, old __getitem__",
+                 access(update, old_getitem))
+    new = report("Update[k] for each key",
+                 access(update, Update.__getitem__))
+    print("Speedup: %.1fx" % (old / new))
+    old = report("Update.to_dict(dict).items()",
+                 lambda: list(update.to_dict(dict).items()))
+    new = report("Update.items()", lambda: update.items())
+    print("Speedup: %.1fx" % (old / new))
+    for o in (3, "abc", [1, 2, 3], {"a": 1}):
+        report("serialize_object(%r)" % (o,), lambda: serialize_object(o))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Benchmarks for the memory used by each instance of a Serializable with and
+without add_slots()"""
+import sys
+
+from annotypes import Anno, Serializable, add_slots
+
+from benchmarks import report
+
+INSTANCES = 100000
+
+with Anno("The value"):
+    AValue = float
+with Anno("The alarm severity"):
+    ASeverity = int
+with Anno("The description"):
+    ADescription = str
+with Anno("Whether it can be written"):
+    AWriteable = bool
+
+
+class Point(Serializable):
+    def __init__(self, value, severity, description, writeable):
+        # type: (AValue, ASeverity, ADescription, AWriteable) -> None
+        self.value = value
+        self.severity = severity
+        self.description = description
+        self.writeable = writeable
+
+
+# Every base class needs slots for instances to have no __dict__, so it
+# can't subclass Point
+@add_slots
+class SlottedPoint(Serializable):
+    __init__ = Point.__dict__["__init__"]
+
+
+def instance_size(inst):
+    """Return the size of inst and its __dict__ if it has one in bytes"""
+    size = sys.getsizeof(inst)
+    if hasattr(inst, "__dict__"):
+        size += sys.getsizeof(inst.__dict__)
+    return size
+
+
+def retained_memory(f):
+    """Return the memory still allocated after running f() in MB"""
+    import tracemalloc
+    tracemalloc.start()
+    kept = f()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return current / 1e6
+
+
+def main():
+    for cls in (Point, SlottedPoint):
+        inst = cls(1.0, 0, "desc", True)
+        assert inst.to_dict()["value"] == 1.0
+        print("%-50s %10d bytes" % (
+            cls.__name__ + " instance size", instance_size(inst)))
+        report(cls.__name__ + "()", lambda: cls(1.0, 0, "desc", True))
+        report(cls.__name__ + ".value", lambda: inst.value, number=1000000)
+        if sys.version_info >= (3, 4):
+            # Share the argument values so only the instances are counted
+            print("%-50s %10.1f MB" % (
+                "%d %s kept memory" % (INSTANCES, cls.__name__),
+                retained_memory(lambda: [
+                    cls(1.0, 0, "desc", True) for _ in range(INSTANCES)])))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Benchmarks for LayoutTable in py2_examples against the same columns in an
+annotypes.Table"""
+from annotypes import Table
+from annotypes.py2_examples.table import LayoutTable, Name, MRI, X, Y, \
+    Visible
+
+from benchmarks import report
+
+
+class ColumnarLayoutTable(Table):
+    def __init__(self, name, mri, x, y, visible):
+        # type: (Name, MRI, X, Y, Visible) -> None
+        self.name = name
+        self.mri = mri
+        self.x = x
+        self.y = y
+        self.visible = visible
+
+
+def main():
+    n = 1000
+    columns = (["BLOCK%d" % i for i in range(n)],
+               ["MRI%d" % i for i in range(n)],
+               [float(i) for i in range(n)],
+               [float(-i) for i in range(n)],
+               [i % 2 == 0 for i in range(n)])
+    old = LayoutTable(*[Name(c) for c in columns[:2]] + [
+        X(columns[2]), Y(columns[3]), Visible(columns[4])])
+    new = ColumnarLayoutTable(*columns)
+    assert old[n - 1] == new[n - 1]
+    t_old = report("LayoutTable[i]", lambda: old[n // 2])
+    t_new = report("ColumnarLayoutTable[i]", lambda: new[n // 2])
+    print("Speedup: %.1fx" % (t_old / t_new))
+
+    def old_mask():
+        # What you would do without Table: filter each column
+        mask = old.visible
+        return LayoutTable(*[
+            [v for v, m in zip(getattr(old, k), mask) if m]
+            for k in old.call_types])
+
+    mask = list(new.visible)
+    t_old = report("LayoutTable visible rows", old_mask, number=1000)
+    t_new = report("ColumnarLayoutTable visible rows", lambda: new[mask],
+                   number=1000)
+    print("Speedup: %.1fx" % (t_old / t_new))
+    report("ColumnarLayoutTable.append()",
+           lambda: new.append("BLOCK", "MRI", 0., 0., True), number=1000)
+
+
+if __name__ == "__main__":
+    main()
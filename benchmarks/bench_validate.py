@@ -0,0 +1,38 @@
+"""Benchmarks for making Arrays with and without validating their elements,
+against checking each element with isinstance"""
+import array
+
+from annotypes import make_array, set_array_validation
+
+from benchmarks import report
+
+N = 1000
+
+
+def main():
+    floats = [float(i) for i in range(N)]
+    buffer = array.array("d", floats)
+    strings = ["s%d" % i for i in range(N)]
+
+    def isinstance_check(typ, seq):
+        # What you would do without validate_elements()
+        assert all(isinstance(x, typ) for x in seq)
+        return make_array(typ, seq)
+
+    for name, typ, seq in (("float list", float, floats),
+                           ("str list", str, strings),
+                           ("array.array('d')", float, buffer)):
+        set_array_validation(False)
+        report("make_array(%s)" % name, lambda: make_array(typ, seq),
+               number=10000)
+        t_old = report("isinstance each, make_array(%s)" % name,
+                       lambda: isinstance_check(typ, seq), number=1000)
+        set_array_validation(True)
+        t_new = report("validating make_array(%s)" % name,
+                       lambda: make_array(typ, seq), number=1000)
+        print("Speedup: %.1fx" % (t_old / t_new))
+    set_array_validation(False)
+
+
+if __name__ == "__main__":
+    main()
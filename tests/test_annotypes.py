@@ -1,15 +1,32 @@
+import array
 import unittest
 import sys
 import collections
+import json
+import os
+import pickle
+import shutil
+import tempfile
 
 import numpy as np
 
 from annotypes import WithCallTypes, Array, Sequence, Anno, Union, \
-    add_call_types, Any, to_array, array_type, TypeVar, Generic, \
-    make_annotations
+    add_call_types, Any, NO_DEFAULT, to_array, array_type, TypeVar, Generic, \
+    make_annotations, make_array, array_cls, evaluate_call_types, \
+    set_type_comment_cache, save_type_comment_caches, coerce_call_types, \
+    Optional, Table, json_encode, set_array_validation, set_array_packing, \
+    serialize_object
+from annotypes._anno import anno_with_default
+from annotypes import _array, _cache
 
 with Anno("Good origin"):
     Good = str
+with Anno("Some names"):
+    Names = Array[str]
+with Anno("Some positions"):
+    Positions = Array[float]
+with Anno("Some counts"):
+    Counts = Array[np.int32]
 
 
 class TestAnnotypes(unittest.TestCase):
@@ -46,6 +63,56 @@ class TestAnnotypes(unittest.TestCase):
                 Bad = [str][1]
         assert str(cm.exception) == "list index out of range"
 
+    def test_names_defined(self):
+        class Annos(object):
+            before = 1
+            with Anno("In a class body"):
+                InClass = int
+            after = 2
+        assert Annos.InClass.name == "InClass"
+        assert Annos.InClass.typ == int
+        with self.assertRaises(AssertionError) as cm:
+            with Anno("Two names"):
+                One = int
+                Two = str
+        assert str(cm.exception).startswith(
+            "Expected a single type to be defined, got [")
+
+    def test_anno_with_default(self):
+        a = anno_with_default(Good, "x")
+        assert a is not Good
+        assert a.default == "x"
+        assert Good.default is NO_DEFAULT
+        # Copies with the same default are shared
+        assert anno_with_default(Good, "x") is a
+        assert anno_with_default(Good, "y").default == "y"
+        # Equal defaults of different types are not
+        one = anno_with_default(Good, 1)
+        assert anno_with_default(Good, True) is not one
+        assert anno_with_default(Good, True).default is True
+        assert anno_with_default(Names, ()) is anno_with_default(Names, ())
+        assert anno_with_default(Names, (1,)) is not \
+            anno_with_default(Names, (True,))
+        # Or floats with different signs
+        assert repr(anno_with_default(Good, -0.0).default) == "-0.0"
+        assert repr(anno_with_default(Good, 0.0).default) == "0.0"
+        assert repr(anno_with_default(Names, (-0.0,)).default) == "(-0.0,)"
+        assert repr(anno_with_default(Names, (0.0,)).default) == "(0.0,)"
+        # Nor are mutable ones
+        default = ["x"]
+        b = anno_with_default(Names, default)
+        assert b.default is default
+        assert anno_with_default(Names, ["x"]) is not b
+        b.name = "Changed"
+        # Shared ones can't be changed
+        with self.assertRaises(AttributeError):
+            a.default = "y"
+        with self.assertRaises(AttributeError):
+            a.name = "Changed"
+        assert a.name == "Good"
+        # And can be given a default again
+        assert anno_with_default(a, "z") is anno_with_default(Good, "z")
+
 
 class TestWithCallTypes(unittest.TestCase):
     def test_bad_arg_type(self):
@@ -56,6 +123,14 @@ class TestWithCallTypes(unittest.TestCase):
                 return arg
         assert str(cm.exception) == \
             "Error evaluating '(NonExistant)': name 'NonExistant' is not defined"
+        # Including when it has a default
+        with self.assertRaises(AssertionError) as cm:
+            @add_call_types
+            def g(arg=""):
+                # type: (str) -> None
+                return arg
+        assert str(cm.exception) == \
+            "Argument 'arg' has type %r which is not an Anno" % str
 
     def test_no_return(self):
         with self.assertRaises(ValueError) as cm:
@@ -130,6 +205,85 @@ class TestWithCallTypes(unittest.TestCase):
         annotations = make_annotations(f)
         assert annotations == {"a": "np.number", 'return': None}
 
+    def test_make_annotations_signature_only(self):
+        def decorator(f):
+            return f
+
+        @decorator
+        def f(a,
+              b):  # Not a type comment
+            """The type comment can come after a docstring"""
+            # type: (int, Callable[..., str]) -> None
+            c = []  # type: List[int]
+            return c
+
+        def g(a):
+            c = []  # type: List[int]
+            return c
+
+        assert make_annotations(f) == {
+            "a": "int", "b": "Callable[..., str]", "return": None}
+        class Index(object):
+            def __getitem__(self, item):
+                return item
+
+        assert make_annotations(f, dict(Callable=Index())) == {
+            "a": int, "b": (Ellipsis, str), "return": None}
+        # Comments in the body are not type comments for the function
+        assert make_annotations(g) == {}
+
+    def test_make_annotations_unsupported(self):
+        def f(a):
+            # type: (Good + 1) -> None
+            return
+
+        with self.assertRaises(ValueError) as cm:
+            make_annotations(f, globals())
+        assert str(cm.exception) == "Error evaluating '(Good + 1)': " \
+                                    "BinOp not supported in type comments"
+
+    def test_type_comment_cache(self):
+        path = tempfile.mkdtemp()
+        filename = os.path.join(path, "cached.py")
+        cache_path = os.path.join(path, "__pycache__", "cached.annotypes.json")
+        source = "def f(a):\n    # type: (Thing) -> None\n    return\n"
+        dont_write_bytecode = sys.dont_write_bytecode
+        enabled = _cache._enabled
+        sys.dont_write_bytecode = False
+        set_type_comment_cache(True)
+        try:
+            with open(filename, "w") as f:
+                f.write(source)
+            namespace = {}
+            exec(compile(source, filename, "exec"), namespace)
+            func = namespace["f"]
+            assert make_annotations(func) == {"a": "Thing", "return": None}
+            save_type_comment_caches()
+            # Change the cache to check it is used
+            with open(cache_path) as f:
+                saved = json.load(f)
+            assert saved["comments"] == {"f:1": [[["(Thing)", "None"]], True]}
+            saved["comments"]["f:1"][0][0][0] = "(Other)"
+            with open(cache_path, "w") as f:
+                json.dump(saved, f)
+            set_type_comment_cache(True)
+            assert make_annotations(func) == {"a": "Other", "return": None}
+            # Changing the source means it isn't used
+            with open(filename, "a") as f:
+                f.write("\n")
+            set_type_comment_cache(True)
+            assert make_annotations(func) == {"a": "Thing", "return": None}
+            # Turning it off means it isn't read or written
+            os.remove(cache_path)
+            set_type_comment_cache(False)
+            assert make_annotations(func) == {"a": "Thing", "return": None}
+            save_type_comment_caches()
+            assert not os.path.exists(cache_path)
+        finally:
+            sys.dont_write_bytecode = dont_write_bytecode
+            set_type_comment_cache(enabled)
+            shutil.rmtree(path)
+
     def test_meta_class(self):
         T = TypeVar("T")
 
@@ -169,6 +323,54 @@ class TestWithCallTypes(unittest.TestCase):
         assert Root.matches_type(Sub1)
         assert not Root.matches_type(Any)
 
+    def test_lazy_call_types(self):
+        class Root(WithCallTypes):
+            def __init__(self, name):
+                # type: (Good) -> None
+                self.name = name
+
+        class Sub(Root):
+            pass
+
+        # Nothing is made until it is accessed
+        assert not isinstance(Sub.__dict__["call_types"], dict)
+        assert not isinstance(Root.__dict__["call_types"], dict)
+        assert list(Sub("foo").call_types) == ["name"]
+        assert list(Sub.__dict__["call_types"]) == ["name"]
+        assert list(Root.__dict__["call_types"]) == ["name"]
+        assert Sub.return_type.typ is Sub
+        assert Sub.__dict__["return_type"].typ is Sub
+
+    def test_lazy_call_types_errors(self):
+        class Bad(WithCallTypes):
+            def __init__(self, arg):
+                # type: (NonExistant) -> None
+                pass
+
+        class Sub(Bad):
+            pass
+
+        with self.assertRaises(ValueError) as cm:
+            evaluate_call_types(Bad)
+        assert str(cm.exception) == \
+            "Error evaluating '(NonExistant)': " \
+            "name 'NonExistant' is not defined"
+        with self.assertRaises(ValueError):
+            Sub.call_types
+
+    def test_evaluate_call_types(self):
+        class Root(WithCallTypes):
+            def __init__(self, name):
+                # type: (Good) -> None
+                self.name = name
+
+        class Sub(Root):
+            pass
+
+        evaluate_call_types(Root)
+        assert list(Sub.__dict__["call_types"]) == ["name"]
+        assert Sub.__dict__["return_type"].typ is Sub
+
     def test_not_stored_repr(self):
         class NotStored(WithCallTypes):
             def __init__(self, a, b):
@@ -230,6 +432,69 @@ class TestManyArgs(unittest.TestCase):
             "ManyArgs(axes=Array(['x']), start=Array([0.0]), stop=Array([1.0]), size=10, units=Array(['mm']), alternate=False)"
         assert inst.start.typ == float
 
+    def test_coerce_call_types(self):
+        Coerced = coerce_call_types(type("Coerced", (self.cls,), {}))
+        inst = Coerced("x", [0.], 1., 10.0, alternate=1)
+        assert repr(inst) == \
+            "Coerced(axes=Array(['x']), start=Array([0.0]), stop=Array([1.0]), size=10, units=Array(['mm']), alternate=True)"
+        assert type(inst.size) == int
+        assert Coerced.__init__.__wrapped__.__name__ == "__init__"
+        with self.assertRaises(ValueError):
+            Coerced("x", [0.], 1., "ten")
+
+    def test_coerce_call_types_optional(self):
+        @coerce_call_types
+        class Opt(WithCallTypes):
+            def __init__(self, good=None, names=None):
+                # type: (Optional[Good], Optional[Names]) -> None
+                self.good = good
+                self.names = names
+
+        inst = Opt()
+        assert inst.good is None
+        assert inst.names == Array[str]()
+        inst = Opt(3, names=["a"])
+        assert inst.good == "3"
+        assert inst.names == Array[str](["a"])
+
+    def test_from_columns(self):
+        insts = self.cls.from_columns(
+            axes=["x", ["x", "y"]], start=[0., [0., 1.]], stop=[1., [2., 3.]],
+            size=np.array([5, 10]), units=["mm", ["mm", "deg"]])
+        assert [repr(i) for i in insts] == [
+            repr(self.cls("x", 0., 1., 5, "mm")),
+            repr(self.cls(["x", "y"], [0., 1.], [2., 3.], 10, ["mm", "deg"]))]
+        assert insts[1].size == 10
+        assert self.cls.from_columns() == []
+        with self.assertRaises(TypeError) as cm:
+            self.cls.from_columns(axes=["x"], start=[0.], stop=[1.])
+        assert str(cm.exception) == "ManyArgs requires column 'size'"
+        with self.assertRaises(TypeError) as cm:
+            self.cls.from_columns(axis=["x"])
+        assert str(cm.exception) == "ManyArgs has no arguments ['axis']"
+        with self.assertRaises(ValueError) as cm:
+            self.cls.from_columns(
+                axes=["x"], start=[0.], stop=[1.], size=[5, 6])
+        assert "don't match" in str(cm.exception)
+
+    def test_from_records(self):
+        Coerced = coerce_call_types(type("Coerced", (self.cls,), {}))
+        insts = Coerced.from_records([
+            ("x", 0., 1., "5"),
+            dict(axes=["x", "y"], start=[0., 1.], stop=[2., 3.], size=10,
+                 units=["mm", "deg"], alternate=1)])
+        assert [repr(i) for i in insts] == [
+            repr(Coerced("x", 0., 1., 5)),
+            repr(Coerced(["x", "y"], [0., 1.], [2., 3.], 10, ["mm", "deg"],
+                         True))]
+        # Defaults are shared between instances
+        insts = Coerced.from_records([("x", 0., 1., 5)] * 3)
+        assert insts[0].units is insts[2].units
+        assert Coerced.from_records([]) == []
+        with self.assertRaises(TypeError) as cm:
+            Coerced.from_records([("x", 0.)])
+        assert str(cm.exception) == "Coerced requires argument 'stop'"
+
 
 class TestComposition(unittest.TestCase):
     def setUp(self):
@@ -356,6 +621,188 @@ class TestArray(unittest.TestCase):
         with self.assertRaises(AssertionError):
             to_array(Array[float], inst)
 
+    def test_validate_elements(self):
+        # Off by default
+        assert make_array(int, ["a"]).seq == ["a"]
+        set_array_validation(True)
+        try:
+            with self.assertRaises(TypeError) as cm:
+                make_array(int, [1, "a", 2.0, 3])
+            assert str(cm.exception) == \
+                "Expected elements of type int, got float, str"
+            with self.assertRaises(TypeError):
+                to_array(Names, 1)
+            assert make_array(str, ["a", u"b"]).seq == ["a", u"b"]
+            assert make_array(float, (1, 2.0, np.float32(3))).seq[2] == 3
+            assert make_array(np.int32, [1, np.int64(2)]).seq[1] == 2
+            assert make_array(bool, [True, np.bool_(False)]).seq[0] is True
+            assert make_array(Anno, [Good]).seq == [Good]
+            assert make_array(Any, [1, "a"]).seq == [1, "a"]
+            with self.assertRaises(TypeError):
+                make_array(bool, [1])
+            # array.array checks the typecode
+            assert len(make_array(float, array.array("f", [1]))) == 1
+            assert len(make_array(np.int32, array.array("i", [1]))) == 1
+            with self.assertRaises(TypeError) as cm:
+                make_array(int, array.array("d", [1]))
+            assert str(cm.exception) == \
+                "Expected array.array of int, got typecode 'd'"
+            with self.assertRaises(TypeError):
+                make_array(np.int64, array.array("b", [1]))
+            # Including the fast paths of coerce_call_types()
+
+            @coerce_call_types
+            class Coerced(WithCallTypes):
+                def __init__(self, positions):
+                    # type: (Positions) -> None
+                    self.positions = positions
+
+            assert Coerced([1.0]).positions.seq == [1.0]
+            with self.assertRaises(TypeError):
+                Coerced(["a"])
+            with self.assertRaises(TypeError):
+                Coerced("a")
+            with self.assertRaises(TypeError):
+                Coerced.from_columns(positions=[["a"]])
+        finally:
+            set_array_validation(False)
+
+    def test_array_packing(self):
+        floats = [1.0, 2.5]
+        unpacked = to_array(Positions, floats)
+        assert unpacked.seq is floats
+        set_array_packing(True)
+        try:
+            packed = to_array(Positions, floats)
+            assert isinstance(packed.seq, array.array)
+            assert packed.seq.typecode == "d"
+            assert packed[1] == 2.5
+            assert packed[1].__class__ is float
+            # It slices and reprs like the list it was made from
+            assert packed[1:] == [2.5]
+            assert packed[1:].__class__ is list
+            assert repr(packed) == repr(unpacked)
+            assert pickle.loads(pickle.dumps(packed))[:1] == [1.0]
+            # But array.arrays that are passed in are kept as they are
+            given = to_array(Positions, array.array("d", floats))
+            assert given[1:].__class__ is array.array
+            assert packed == floats
+            assert floats == packed
+            assert packed == unpacked
+            assert unpacked == packed
+            assert packed != [1.0, 2.0]
+            assert json_encode(packed) == json_encode(unpacked)
+            assert serialize_object(packed) == floats
+            assert to_array(Array[int], [1, 2]).seq.typecode in "lq"
+            # Only exact matches are packed so the elements don't change
+            assert to_array(Positions, [1, 2.5]).seq.__class__ is list
+            assert to_array(Array[int], [True]).seq.__class__ is list
+            assert to_array(Array[int], [1 << 64]).seq.__class__ is list
+            assert to_array(Names, ["a"]).seq.__class__ is list
+            # Including the fast paths of coerce_call_types()
+
+            @coerce_call_types
+            class Coerced(WithCallTypes):
+                def __init__(self, positions):
+                    # type: (Positions) -> None
+                    self.positions = positions
+
+            assert Coerced(floats).positions.seq.__class__ is array.array
+            assert Coerced.from_columns(
+                positions=[floats])[0].positions.seq.__class__ is array.array
+        finally:
+            set_array_packing(False)
+
+    def test_array_equality(self):
+        floats = [1.0, 2.5, 3.0]
+        backings = [floats, tuple(floats), array.array("d", floats),
+                    np.array(floats)]
+        for a in backings:
+            for b in backings:
+                assert make_array(float, a) == make_array(float, b)
+                assert make_array(float, a) != make_array(float, b[:2])
+                assert make_array(float, a) == b
+                assert make_array(float, a) != list(b[:2]) + [4.0]
+        # Different lengths don't compare elementwise
+        assert make_array(float, np.zeros(3)) != np.zeros(4)
+        assert make_array(float, np.zeros((2, 3))) != np.zeros((2, 2))
+        assert make_array(int, array.array("i", [1, 2])) == \
+            make_array(int, array.array("l", [1, 2]))
+        assert make_array(str, ["a"]) != "a"
+
+    def test_array_hash(self):
+        a = make_array(float, [1.0, 2.0])
+        with self.assertRaises(TypeError) as cm:
+            hash(a)
+        assert str(cm.exception) == \
+            "Array of list is unhashable, use frozen() to make a hashable copy"
+        frozen = a.frozen()
+        assert frozen == a
+        assert frozen.seq == (1.0, 2.0)
+        assert frozen.frozen() is frozen
+        assert hash(frozen) == hash(frozen)
+        # Equal Arrays have equal hashes whatever they wrap
+        frozen_np = make_array(float, np.array([1.0, 2.0])).frozen()
+        assert not frozen_np.seq.flags.writeable
+        assert frozen_np.frozen() is frozen_np
+        assert frozen_np == frozen
+        assert hash(frozen_np) == hash(frozen)
+        cache = {frozen: "x"}
+        assert cache[frozen_np] == "x"
+        # Including when they have more than one dimension
+        frozen_2d = make_array(float, np.array([[1.0, 2.0]])).frozen()
+        nested = make_array(float, ((1.0, 2.0),))
+        assert frozen_2d == nested
+        assert hash(frozen_2d) == hash(nested)
+        assert make_array(float, [[1.0, 2.0]]).frozen().seq == ((1.0, 2.0),)
+        with self.assertRaises(TypeError):
+            hash(make_array(float, np.array([1.0, 2.0])))
+
+    def test_make_array(self):
+        inst = make_array(int, [1, 2, 3])
+        assert isinstance(inst, Array)
+        assert inst.typ is int
+        assert inst == Array[int]([1, 2, 3])
+        assert make_array(str).seq == []
+        with self.assertRaises(AssertionError):
+            make_array(float, np.arange(3))
+
+    def test_to_array_no_stack_walk(self):
+        def find_caller_class(filename):
+            raise AssertionError("Shouldn't walk the stack")
+
+        orig = _array.find_caller_class
+        _array.find_caller_class = find_caller_class
+        try:
+            assert to_array(Array[int], [1, 2]).typ is int
+            assert to_array(Array[str], "x").seq == ["x"]
+            assert ATestArray([1, 2]).seq == [1, 2]
+        finally:
+            _array.find_caller_class = orig
+
+    def test_array_cls(self):
+        cls = array_cls(float)
+        assert cls is array_cls(float)
+        assert cls is not array_cls(int)
+        assert issubclass(cls, Array)
+        assert cls.typ is float
+        assert array_type(cls) is float
+        inst = cls([1.5])
+        assert inst.typ is float
+        assert inst.__class__ is cls
+        assert make_array(float, [1.5]).__class__ is cls
+        assert to_array(Array[float], [1.5]).__class__ is cls
+        assert to_array(cls, inst) is inst
+        assert ATestArray._array_cls is array_cls(int)
+
+    def test_pickle(self):
+        inst = make_array(int, [1, 2])
+        unpickled = pickle.loads(pickle.dumps(inst))
+        assert unpickled == inst
+        assert unpickled.__class__ is array_cls(int)
+        unpickled = pickle.loads(pickle.dumps(Array[int]([1, 2])))
+        assert unpickled == inst
+
     def test_to_array_unicode(self):
         inst = to_array(Array[str], u"233")
         assert inst.seq[0] == "233"
@@ -426,6 +873,53 @@ class TestTable(unittest.TestCase):
             "LayoutTable(name=Array(['BLOCK']), mri=Array(['MRI']), x=Array([0.5]), y=Array([2.5]), visible=Array([True]))"
         layout.mri = Array[str]()
 
+    def test_columnar_table(self):
+        class Points(Table):
+            def __init__(self, names, positions, counts):
+                # type: (Names, Positions, Counts) -> None
+                self.names = names
+                self.positions = positions
+                self.counts = counts
+
+        t = Points(["a", "b", "c"], [1, 2, 3], [4, 5, 6])
+        assert len(t) == 3
+        assert t.names.seq == ["a", "b", "c"]
+        assert t.positions.seq == array.array("d", [1., 2., 3.])
+        assert t.counts.seq.dtype == np.int32
+        assert t[1] == ["b", 2.0, 5]
+        assert t[-1] == ["c", 3.0, 6]
+        assert repr(t[1:]) == repr(Points(["b", "c"], [2, 3], [5, 6]))
+        assert repr(t[[True, False, True]]) == repr(t[[0, 2]]) == \
+            repr(Points(["a", "c"], [1, 3], [4, 6]))
+        assert len(t[[]]) == 0
+        with self.assertRaises(IndexError):
+            t[[True, False]]
+        # Changing a column checks its length against the others
+        with self.assertRaises(ValueError) as cm:
+            t.positions = [1.]
+        assert str(cm.exception) == "Column positions has length 1, expected 3"
+        t.positions = np.array([3., 2., 1.])
+        assert t[0] == ["a", 3.0, 4]
+        # A numpy mask selects from list and numpy columns alike
+        assert repr(t[np.array([False, True, True])]) == repr(t[[1, 2]])
+        assert t[np.array([False, True, True])][0] == ["b", 2.0, 5]
+        assert repr(t[np.array([2, 0])]) == repr(t[[2, 0]])
+        names = t.names
+        t.append("d", 0., counts=7)
+        # Arrays got before appending don't change
+        assert list(names) == ["a", "b", "c"]
+        t.extend(t[:2])
+        assert len(t) == 6
+        assert list(t.names) == ["a", "b", "c", "d", "a", "b"]
+        assert json_encode(t.positions) == "[3.0, 2.0, 1.0, 0.0, 3.0, 2.0]"
+        assert t.counts.seq.tolist() == [4, 5, 6, 7, 4, 5]
+        with self.assertRaises(ValueError):
+            t.extend(["e"], [1.], [1, 2])
+        with self.assertRaises(TypeError) as cm:
+            t.append("e", 1.)
+        assert str(cm.exception) == "Missing columns ['counts']"
+        assert len(t) == 6
+
 
 class TestDict(unittest.TestCase):
     def setUp(self):
@@ -1,12 +1,20 @@
 from collections import OrderedDict
+import array
+import pickle
+import sys
 import numpy as np
 import unittest
+import weakref
 
 from enum import Enum
 
 from annotypes import Anno, Array, Mapping, Union, Sequence, Any, \
     Serializable, deserialize_object, serialize_object, FrozenOrderedDict, \
-    json_encode, json_decode
+    json_encode, json_decode, register_serializer, json_encode_iter, \
+    json_dump, ARRAY_BUFFER_TYPEID, binary_encode, binary_decode, \
+    json_deserialize, TrackedSerializable, apply_changes, MemoizedSerializable, \
+    add_slots
+from annotypes import _serializable
 
 with Anno("A Boo"):
     ABoo = int
@@ -64,6 +72,58 @@ class NestedSerializable(Serializable):
         self.dsarray = ADSArray(dsarray)
 
 
+@Serializable.register_subclass("trackedchild:1.0")
+class TrackedChild(TrackedSerializable):
+    def __init__(self, boo, NOT_CAMEL):
+        # type: (ABoo, UNotCamel) -> None
+        self.boo = boo
+        self.NOT_CAMEL = ANotCamel(NOT_CAMEL)
+
+
+@Serializable.register_subclass("trackedparent:1.0")
+class TrackedParent(TrackedSerializable):
+    def __init__(self, boo, bar):
+        # type: (ABoo, ABar) -> None
+        self.boo = boo
+        self.bar = bar
+
+
+@Serializable.register_subclass("memochild:1.0")
+class MemoChild(MemoizedSerializable):
+    def __init__(self, boo):
+        # type: (ABoo) -> None
+        self.boo = boo
+
+
+with Anno("A MemoChild"):
+    AMemoChild = MemoChild
+
+
+@Serializable.register_subclass("memoparent:1.0")
+class MemoParent(MemoizedSerializable, TrackedSerializable):
+    def __init__(self, child, bar):
+        # type: (AMemoChild, ABar) -> None
+        self.child = child
+        self.bar = bar
+
+
+@Serializable.register_subclass("slotted:1.0")
+@add_slots
+class SlottedSerializable(Serializable):
+    boo = None
+
+    def __init__(self, boo, bar):
+        # type: (ABoo, ABar) -> None
+        self.boo = boo
+        self.bar = bar
+
+    def __repr__(self):
+        # super() uses a __class__ cell, which add_slots() has to change
+        if sys.version_info < (3,):
+            return super(SlottedSerializable, self).__repr__()
+        return super().__repr__()
+
+
 class TestSerialization(unittest.TestCase):
 
     def setUp(self):
@@ -86,10 +146,29 @@ class TestSerialization(unittest.TestCase):
         with self.assertRaises(KeyError):
             self.s["bad"]
         assert self.s["typeid"] == "foo:1.0"
+        # A typeid string made at runtime isn't interned
+        assert self.s["".join(["type", "id"])] == "foo:1.0"
+        with self.assertRaises(KeyError):
+            EmptySerializable()["typeid".upper()]
 
     def test_iter(self):
         assert list(self.s) == ['boo', 'bar', 'NOT_CAMEL']
 
+    def test_mapping(self):
+        assert list(self.s.keys()) == ['boo', 'bar', 'NOT_CAMEL']
+        assert self.s.values() == [self.s.boo, self.s.bar, self.s.NOT_CAMEL]
+        assert self.s.items() == list(zip(self.s.keys(), self.s.values()))
+        assert dict(self.s) == dict(self.s.items())
+        assert "boo" in self.s
+        assert "bad" not in self.s
+        assert self.s.get("boo") == 3
+        assert self.s.get("bad", 4) == 4
+        assert EmptySerializable()
+        # numpy doesn't take it to be a sequence
+        a = np.asarray([self.s, self.s])
+        assert a.shape == (2,)
+        assert a.dtype == object
+
     def test_serialize(self):
         x = serialize_object(self.s)
         assert x == self.expected
@@ -102,6 +181,15 @@ class TestSerialization(unittest.TestCase):
             deserialize_object(self.expected)
         assert str(cm.exception) == "foo:1.0 raised error: __init__() got an unexpected keyword argument 'extra'"
 
+    def test_from_dict_ignore(self):
+        self.expected["extra"] = "thing"
+        n = DummySerializable.from_dict(self.expected, ignore=("extra",))
+        assert n.boo == 3
+
+    def test_from_dict_wrong_typeid(self):
+        with self.assertRaises(AssertionError):
+            EmptySerializable.from_dict(self.expected)
+
     def test_no_typeid(self):
         with self.assertRaises(TypeError) as cm:
             deserialize_object({})
@@ -122,8 +210,16 @@ class TestSerialization(unittest.TestCase):
         items = [("typeid", "me"), ("a", 1), ("b", "two")]
         d = FrozenOrderedDict(items)
         assert list(d) == list(d.keys()) == ["typeid", "a", "b"]
-        assert d.items() == list(d.iteritems()) == items
-        assert d.values() == list(d.itervalues()) == ["me", 1, "two"]
+        assert list(d.items()) == list(d.iteritems()) == items
+        assert list(d.values()) == list(d.itervalues()) == ["me", 1, "two"]
+        # Can be used as a key, whatever order it was made in
+        lookup = {d: "d"}
+        assert lookup[FrozenOrderedDict(reversed(items))] == "d"
+        assert hash(d) == hash(d)
+        assert pickle.loads(pickle.dumps(d)) == d
+        assert list(pickle.loads(pickle.dumps(d))) == ["typeid", "a", "b"]
+        with self.assertRaises(TypeError):
+            hash(FrozenOrderedDict([("a", [])]))
         with self.assertRaises(TypeError):
             d["a"] = 2
         with self.assertRaises(TypeError):
@@ -148,6 +244,36 @@ class TestSerialization(unittest.TestCase):
         assert json_encode(s1) == \
             '{"typeid": "foo:1.0", "boo": 3, "bar": {}, "NOT_CAMEL": [3, 4]}'
 
+    def test_serialize_binary(self):
+        data = np.array([3, 4])
+        s1 = DummySerializable(3, {"b": [5, 6]}, data)
+        d = serialize_object(s1, binary=True)
+        assert list(d) == ["typeid", "boo", "bar", "NOT_CAMEL"]
+        assert d["bar"] == {"b": [5, 6]}
+        buf = d["NOT_CAMEL"]
+        assert buf["typeid"] == ARRAY_BUFFER_TYPEID
+        assert buf["dtype"] == data.dtype.str
+        assert buf["shape"] == [2]
+        assert isinstance(buf["data"], memoryview)
+        s2 = deserialize_object(d, DummySerializable)
+        assert s2.boo == 3
+        assert s2.NOT_CAMEL.typ == int
+        assert s2.NOT_CAMEL.seq.tolist() == [3, 4]
+        # Check it shares the memory of the original
+        data[0] = 7
+        assert s2.NOT_CAMEL[0] == 7
+
+    def test_serialize_binary_ndarray(self):
+        data = np.arange(6, dtype=np.float32).reshape(2, 3)
+        # Not contiguous, so has to be copied
+        d = serialize_object({"a": data.T}, binary=True)
+        assert d["a"]["shape"] == [3, 2]
+        a = deserialize_object(d["a"])
+        assert a.typ == np.float32
+        assert a.seq.tolist() == data.T.tolist()
+        # Non-numpy data is serialized as normal
+        assert serialize_object([1, "a"], binary=True) == [1, "a"]
+
     def test_exception_serialize(self):
         s = json_encode({"message": ValueError("Bad result")})
         assert s == '{"message": "ValueError: Bad result"}'
@@ -159,6 +285,174 @@ class TestSerialization(unittest.TestCase):
         s = json_encode({"who": MyEnum.ME})
         assert s == '{"who": "me"}'
 
+    def test_serialize_primitives(self):
+        for o in (None, True, 3, 2.5, "s", u"u", (1, 2)):
+            assert serialize_object(o) is o
+
+    def test_register_serializer(self):
+        class Point(object):
+            def __init__(self, x, y):
+                self.x = x
+                self.y = y
+
+        class SubPoint(Point):
+            pass
+
+        p = Point(1, np.float64(2.5))
+        assert serialize_object(p) is p
+        register_serializer(
+            Point, lambda o, dict_cls: [o.x, serialize_object(o.y, dict_cls)])
+        assert serialize_object(p) == [1, 2.5]
+        assert serialize_object(SubPoint(3, 4)) == [3, 4]
+        assert json_encode(dict(p=p)) == '{"p": [1, 2.5]}'
+
+    def test_serialize_list_dict_cls(self):
+        x = serialize_object([dict(a=1), EmptySerializable()], OrderedDict)
+        assert x == [dict(a=1), dict(typeid="empty:1.0")]
+        assert [type(d) for d in x] == [OrderedDict, OrderedDict]
+
+    def assert_streams_same(self, o, **kwargs):
+        expected = json_encode(o, indent=kwargs.get("indent", None))
+        chunks = list(json_encode_iter(o, **kwargs))
+        assert "".join(chunks) == expected
+        return chunks
+
+    def test_json_encode_iter(self):
+        class MyEnum(Enum):
+            ME = "me"
+
+        n = NestedSerializable(13, [self.s, self.s])
+        objects = [
+            self.s, n, EmptySerializable(), [], {}, (), ADSArray(),
+            {"a": [n, ValueError("Bad")], 1: None, 2.5: True, None: MyEnum.ME},
+            DummySerializable(3, {}, np.arange(1000)),
+            ANotCamel(np.arange(6).reshape(2, 3)), np.float64(3.5),
+            [u"\u00e9", "x", -1e300, 1e-10, False], (1, [2, {"3": []}]),
+        ]
+        for o in objects:
+            for indent in (None, 2):
+                for chunk_size in (1, 64, 65536):
+                    self.assert_streams_same(
+                        o, indent=indent, chunk_size=chunk_size)
+
+    def test_json_encode_iter_chunks(self):
+        o = DummySerializable(3, {}, np.arange(10000))
+        chunks = self.assert_streams_same(o, chunk_size=1000)
+        assert len(chunks) > 10
+        assert max(len(c) for c in chunks) < 2000
+
+    def test_json_encode_iter_bad_key(self):
+        with self.assertRaises(TypeError):
+            list(json_encode_iter({(1, 2): 3}))
+
+    def test_json_dump(self):
+        class Writer(object):
+            def __init__(self):
+                self.chunks = []
+
+            def write(self, s):
+                self.chunks.append(s)
+
+        fp = Writer()
+        json_dump(self.s, fp, indent=4)
+        assert "".join(fp.chunks) == json_encode(self.s, indent=4)
+
+    def test_binary_round_trip(self):
+        o = dict(
+            s=self.s, s2=self.s, empty=EmptySerializable(),
+            prims=[None, True, False, -3, 2 ** 70, 1.5, u"\xe9", (1, 2)])
+        b = binary_encode(o)
+        # The second foo:1.0 refers back to the first typeid
+        assert b.count(b"foo:1.0") == 1
+        d = binary_decode(b)
+        assert list(d) == list(o)
+        assert isinstance(d["s"], DummySerializable)
+        assert d["s"].to_dict() == self.expected
+        assert d["s2"].to_dict() == self.expected
+        assert isinstance(d["empty"], EmptySerializable)
+        assert d["prims"] == [None, True, False, -3, 2 ** 70, 1.5, u"\xe9",
+                              [1, 2]]
+
+    def test_binary_overridden_to_dict(self):
+        # MemoizedSerializable overrides to_dict, so is written as a map
+        o = MemoParent(MemoChild(1), dict(a=MemoChild(2), b=3))
+        d = binary_decode(binary_encode([o, o.child]))
+        assert isinstance(d[0], MemoParent)
+        assert isinstance(d[0].child, MemoChild)
+        assert isinstance(d[1], MemoChild)
+        assert d[0].to_dict() == o.to_dict()
+        # Unregistered typeids are left as dicts
+        d = binary_decode(binary_encode(dict(typeid="unknown:1.0", a=1)))
+        assert d == dict(typeid="unknown:1.0", a=1)
+        assert isinstance(d, FrozenOrderedDict)
+
+    def test_binary_arrays(self):
+        data = np.arange(6, dtype=np.float32).reshape(2, 3)
+        o = [array.array("h", [1, -2]), data.T, Array[np.float32](data[0]),
+             DummySerializable(3, {}, np.array([3, 4]))]
+        d = binary_decode(binary_encode(o))
+        assert d[0] == array.array("h", [1, -2])
+        assert d[1].dtype == np.float32
+        assert d[1].tolist() == data.T.tolist()
+        assert d[2].tolist() == [0, 1, 2]
+        assert d[3].NOT_CAMEL.seq.tolist() == [3, 4]
+
+    def test_binary_packed_lists(self):
+        lists = [[1.5, 2.5], [1, -2], [2 ** 70, 1], [True, False],
+                 [u"a", u"\xe9", u""], [u"a\x00", u"b"], [1, 2.5]]
+        b = binary_encode(lists)
+        d = binary_decode(b)
+        assert d == lists
+        for x, y in zip(lists, d):
+            assert list(map(type, x)) == list(map(type, y))
+
+    def test_binary_decode_errors(self):
+        b = binary_encode(self.s)
+        with self.assertRaises(ValueError):
+            binary_decode(b[:-1])
+        with self.assertRaises(ValueError):
+            binary_decode(b + b"N")
+        with self.assertRaises(ValueError) as cm:
+            binary_decode(b.replace(b"foo:1.0", b"bad:1.0"))
+        assert str(cm.exception) == \
+            "Error decoding binary object ('bad:1.0' not a valid typeid)"
+
+    def test_json_deserialize(self):
+        n = NestedSerializable(2, [self.s, self.s])
+        o = json_deserialize(json_encode(n), NestedSerializable)
+        assert o.to_dict() == n.to_dict()
+        assert isinstance(o.dsarray[1], DummySerializable)
+        # Unregistered typeids are left as dicts
+        d = json_deserialize('[{"typeid": "unknown:1.0", "a": 1}]')
+        assert d == [{"typeid": "unknown:1.0", "a": 1}]
+        assert isinstance(d[0], FrozenOrderedDict)
+        with self.assertRaises(TypeError) as cm:
+            json_deserialize('{"typeid": "unknown:1.0"}')
+        assert str(cm.exception) == "'unknown:1.0' not a valid typeid"
+        with self.assertRaises(ValueError):
+            json_deserialize('{"typeid"')
+
+    def test_json_deserialize_fallbacks(self):
+        # Out of order keys go through from_dict
+        o = json_deserialize(
+            '{"typeid": "foo:1.0", "bar": {}, "boo": 3, "NOT_CAMEL": [1]}')
+        assert o.boo == 3
+        assert o.NOT_CAMEL == [1]
+        # As do extra keys, giving the same error as from_dict
+        with self.assertRaises(TypeError) as cm:
+            json_deserialize('{"typeid": "foo:1.0", "boo": 3, "bar": {}, '
+                             '"NOT_CAMEL": [1], "extra": 1}')
+        assert str(cm.exception) == "foo:1.0 raised error: __init__() got " \
+                                    "an unexpected keyword argument 'extra'"
+
+        class Custom(EmptySerializable):
+            @classmethod
+            def from_dict(cls, d, ignore=()):
+                return "custom"
+
+        Serializable.register_subclass("custom:1.0")(Custom)
+        assert json_deserialize('{"typeid": "custom:1.0"}') == "custom"
+
     def test_serializable_not_setting_attr(self):
         class NoAttr(Serializable):
             def __init__(self, boo):
@@ -177,7 +471,39 @@ class TestSerialization(unittest.TestCase):
     def test_json_decode(self):
         d = json_decode('{"a": 1, "b": 2}')
         assert list(d) == ["a", "b"]
-        assert d.values() == [1, 2]
+        assert list(d.values()) == [1, 2]
+
+    def test_json_decode_intern(self):
+        s = '{"x": {"b": [1, 2]}, "y": {"b": [1, 2]}, "z": {"b": true}, ' \
+            '"w": {"b": 1}}'
+        d = json_decode(s, intern=True)
+        assert d == json_decode(s)
+        assert d["x"] is d["y"]
+        assert d["z"] is not d["w"]
+        # Nor are the items in lists
+        lists = [json_decode('{"a": [%s]}' % x, intern=True)
+                 for x in ("1", "1.0", "true")]
+        assert [lists[i]["a"][0].__class__ for i in range(3)] == \
+            [int, float, bool]
+        # 0.0 and -0.0 are different, but NaN is the same as NaN
+        zeros = [json_decode('{"a": %s}' % x, intern=True)
+                 for x in ("0.0", "-0.0", "[0.0]", "[-0.0]")]
+        assert [repr(zeros[i]["a"]) for i in range(4)] == \
+            ["0.0", "-0.0", "[0.0]", "[-0.0]"]
+        nan = json_decode('{"a": NaN}', intern=True)
+        assert json_decode('{"a": NaN}', intern=True) is nan
+        # Lists of lists can't be hashed, so aren't interned
+        d2 = json_decode('{"v": {"b": [[1]]}, "u": {"b": [[1]]}}', intern=True)
+        assert d2["v"] == d2["u"]
+        assert d2["v"] is not d2["u"]
+        # Dicts are shared between calls while they are alive
+        assert json_decode(s, intern=True) is d
+        assert json_decode('{"b": [1, 2]}', intern=True) is d["x"]
+        del d, d2, lists, zeros, nan
+        assert json_decode('{"b": [1, 2]}', intern=True) is not None
+        assert len(_serializable._interned) == 0
+        with self.assertRaises(AssertionError):
+            json_decode(s, dict_cls=OrderedDict, intern=True)
 
     def test_json_decode_not_dict(self):
         with self.assertRaises(ValueError):
@@ -198,6 +524,37 @@ class TestSerialization(unittest.TestCase):
         n = DummySerializable.from_dict(expected)
         assert n.to_dict() == expected
 
+    def test_generated_serializer(self):
+        self.s.to_dict()
+        serializer = DummySerializable.__dict__["_serializer"]
+        assert serializer(self.s, OrderedDict) == self.expected
+        # Not inherited by subclasses
+        class Sub(DummySerializable):
+            pass
+        assert "_serializer" not in Sub.__dict__
+        assert Sub(1, {}, [2]).to_dict() == \
+            dict(typeid="foo:1.0", boo=1, bar={}, NOT_CAMEL=[2])
+
+    def test_serializer_fallbacks(self):
+        n = NestedSerializable(13, [])
+        # Wrong types are still serialized
+        n.boo = np.int32(4)
+        n.dsarray = [EmptySerializable()]
+        assert n.to_dict() == dict(
+            typeid="nested:1.0", boo=4, dsarray=[dict(typeid="empty:1.0")])
+        self.s.NOT_CAMEL = ANotCamel(np.arange(2))
+        assert self.s.to_dict()["NOT_CAMEL"] == [0, 1]
+
+    def test_serializer_reregister(self):
+        class Registered(Serializable):
+            def __init__(self, boo):
+                # type: (ABoo) -> None
+                self.boo = boo
+
+        assert Registered(1).to_dict() == dict(boo=1)
+        Serializable.register_subclass("registered:1.0")(Registered)
+        assert Registered(1).to_dict() == dict(typeid="registered:1.0", boo=1)
+
     def test_to_dict_nested(self):
 
         n = NestedSerializable(13, self.s)
@@ -207,3 +564,114 @@ class TestSerialization(unittest.TestCase):
         expected["dsarray"] = [self.expected]
 
         assert n.to_dict() == expected
+
+    def test_changes(self):
+        def make_parent():
+            return TrackedParent(1, OrderedDict([
+                ("a", TrackedChild(2, [1])), ("b", TrackedChild(3, [2]))]))
+
+        parent = make_parent()
+        remote_o = make_parent()
+        # Everything is new, so it is sent whole
+        changes = parent.changes()
+        assert changes == [[[], parent.to_dict()]]
+        remote_d = apply_changes(FrozenOrderedDict(), changes)
+        assert remote_d == parent.to_dict()
+        assert parent.changes() == []
+        # Only the attributes that were set are sent
+        parent.boo = 7
+        parent.bar["a"].boo = 5
+        parent.bar["b"].NOT_CAMEL = ANotCamel([4, 5])
+        changes = parent.changes()
+        assert changes == [
+            [["boo"], 7], [["bar", "a", "boo"], 5],
+            [["bar", "b", "NOT_CAMEL"], [4, 5]]]
+        assert parent.changes() == []
+        before = remote_d
+        remote_d = apply_changes(remote_d, changes)
+        assert remote_d == parent.to_dict()
+        # The FrozenOrderedDicts on the changed paths were replaced
+        assert before["boo"] == 1
+        assert remote_d["bar"]["b"] is not before["bar"]["b"]
+        assert apply_changes(remote_o, changes) is remote_o
+        assert remote_o.to_dict() == parent.to_dict()
+        assert remote_o.bar["b"].NOT_CAMEL == ANotCamel([4, 5])
+        # A new child is sent whole, and changes inside it are forgotten
+        parent.bar = dict(c=TrackedChild(8, []))
+        changes = parent.changes()
+        assert changes == [[["bar"], dict(c=parent.bar["c"].to_dict())]]
+        assert parent.changes() == []
+        apply_changes(remote_o, changes)
+        assert isinstance(remote_o.bar["c"], TrackedChild)
+        assert remote_o.to_dict() == parent.to_dict()
+        assert apply_changes(remote_d, changes) == parent.to_dict()
+
+    def test_memoized_to_dict(self):
+        parent = MemoParent(MemoChild(1), dict(a=MemoChild(2), b=3))
+        d = parent.to_dict()
+        assert d == dict(typeid="memoparent:1.0",
+                         child=dict(typeid="memochild:1.0", boo=1),
+                         bar=dict(a=dict(typeid="memochild:1.0", boo=2), b=3))
+        assert parent.to_dict() is d
+        # Mutable dicts are made each time
+        assert parent.to_dict(OrderedDict) == d
+        assert parent.to_dict(OrderedDict) is not parent.to_dict(OrderedDict)
+        # Setting an attribute of a child makes its parents again, but
+        # reuses the dicts of the children that didn't change
+        parent.bar["a"].boo = 4
+        d2 = parent.to_dict()
+        assert d2 is not d
+        assert d2["bar"]["a"]["boo"] == 4
+        assert d2["child"] is d["child"]
+        assert json_decode(json_encode(parent)) == d2
+        # Setting an attribute makes it again
+        parent.child = MemoChild(5)
+        assert parent.to_dict()["child"]["boo"] == 5
+        # It still tracks changes too
+        assert parent.changes() == [[[], parent.to_dict()]]
+        parent.bar = {}
+        assert parent.changes() == [[["bar"], {}]]
+        assert parent.to_dict()["bar"] == {}
+
+    def test_memoized_untracked_child(self):
+        # Setting attributes of a plain Serializable isn't seen, so it isn't
+        # memoized
+        parent = MemoParent(MemoChild(1), dict(a=TrackedChild(1, [2])))
+        d = parent.to_dict()
+        assert parent.to_dict() is not d
+        parent.bar["a"].boo = 5
+        assert parent.to_dict()["bar"]["a"]["boo"] == 5
+        # But its MemoizedSerializable children still are
+        assert parent.to_dict()["child"] is d["child"]
+
+    def test_memoized_arrays(self):
+        # Arrays of numbers aren't looked through, but are still memoized
+        for bar in (Array[float]([1., 2.]), Array[np.float64](np.ones(3))):
+            parent = MemoParent(MemoChild(1), bar)
+            d = parent.to_dict()
+            assert parent.to_dict() is d
+        # Arrays of MemoizedSerializables are
+        parent = MemoParent(MemoChild(1), Array[MemoChild]([MemoChild(2)]))
+        d = parent.to_dict()
+        assert parent.to_dict() is d
+        parent.bar[0].boo = 3
+        assert parent.to_dict()["bar"][0]["boo"] == 3
+
+    def test_add_slots(self):
+        o = SlottedSerializable(1, dict(a=2))
+        assert SlottedSerializable.__slots__ == ("boo", "bar", "__weakref__")
+        assert not hasattr(o, "__dict__")
+        assert weakref.ref(o)() is o
+        with self.assertRaises(AttributeError):
+            o.other = 3
+        assert o["boo"] == 1
+        assert list(o.items()) == [("boo", 1), ("bar", dict(a=2))]
+        assert repr(o) == "SlottedSerializable(boo=1, bar={'a': 2})"
+        d = o.to_dict()
+        assert d == dict(typeid="slotted:1.0", boo=1, bar=dict(a=2))
+        # The remade class is the one that is registered
+        o2 = deserialize_object(d)
+        assert o2.__class__ is SlottedSerializable
+        assert o2.to_dict() == d
+        assert json_deserialize(json_encode(o)).to_dict() == d
+        assert pickle.loads(pickle.dumps(o, 2)).to_dict() == d